@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,7 +26,7 @@ SECRET_KEY = 'django-insecure-tso-spb&)0fbf_lpc6pteo#j(nfv!c))ph$9(k0j(*xaal0#=a
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split()
 
 
 # Application definition
@@ -78,6 +79,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL позволяет читать базу, пока парсер пишет результаты пачками
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -122,3 +129,40 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Telegram webhook
+# Telegram передает секрет в заголовке X-Telegram-Bot-Api-Secret-Token; без секрета webhook отклоняет все запросы.
+# Шаги диалога бота хранятся в памяти процесса, поэтому webhook запускается с одним воркером
+
+TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
+
+
+# Logging
+# Построчные сообщения о каждом письме пишутся на уровне DEBUG; по умолчанию выводятся только итоги и ошибки
+
+PARSER_LOG_LEVEL = os.environ.get('PARSER_LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'parser': {'handlers': ['console'], 'level': PARSER_LOG_LEVEL, 'propagate': False},
+    },
+}
+
+
+# Metrics and profiling
+# Если задан токен, /metrics требует заголовок Authorization: Bearer <токен>
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Каталог для профилей задач парсинга; пока он не задан, профилирование выключено
+PARSER_PROFILE_DIR = os.environ.get('PARSER_PROFILE_DIR', '')
+PARSER_PROFILE_MODE = os.environ.get('PARSER_PROFILE_MODE', 'sampling')  # "sampling" или "cprofile"
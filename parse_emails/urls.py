@@ -17,6 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from parser import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('telegram/webhook/', views.telegram_webhook, name='telegram_webhook'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from parser.models import AutoNews, UserNews
+from parser.models import AutoNews, UserNews, MailboxSyncState, ParsingJob, DomainEnrichment
 
 admin.site.register(AutoNews)
 admin.site.register(UserNews)
+admin.site.register(MailboxSyncState)
+admin.site.register(ParsingJob)
+admin.site.register(DomainEnrichment)
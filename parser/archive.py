@@ -0,0 +1,111 @@
+"""Чтение архивов писем (mbox, Maildir, каталог с .eml) через mmap без загрузки файла целиком"""
+import mmap
+import os
+import re
+
+import django
+
+
+MMAP_MIN_BYTES = 64 * 1024  # Файлы меньше читаются обычным read(): mmap для них дороже
+EML_SUFFIXES = (".eml",)
+
+MBOX_SEPARATOR = b"\nFrom "
+ESCAPED_FROM_RE = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+
+def _unescape_from(raw):
+    # mbox экранирует строки "From " внутри писем как ">From "
+    if b">From " in raw:
+        return ESCAPED_FROM_RE.sub(rb"\1", raw)
+    return raw
+
+
+def iter_mbox(path):
+    """Отдает сырые письма mbox-файла (Google Takeout и т. п.) по одному.
+
+    Файл отображается в память, а границы писем ищутся по строкам "From " без разбора
+    содержимого, поэтому в памяти процесса держится только текущее письмо.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:5] == b"From ":
+                start = 0
+            else:
+                start = mapped.find(MBOX_SEPARATOR)
+                if start == -1:
+                    return
+                start += 1
+
+            while start < len(mapped):
+                body_start = mapped.find(b"\n", start) + 1  # Пропускаем строку-разделитель "From ..."
+                if body_start == 0:
+                    return
+                end = mapped.find(MBOX_SEPARATOR, body_start)
+                if end == -1:
+                    end = len(mapped)
+
+                raw = mapped[body_start:end]
+                if end == len(mapped) and raw.endswith(b"\n\n"):
+                    raw = raw[:-1]  # Пустая строка в конце файла относится к разделителю, а не к письму
+                if raw.strip():
+                    yield _unescape_from(raw)
+                start = end + 1
+
+
+def read_message_file(path):
+    """Читает одно письмо из файла; большие файлы отображаются в память"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            return f.read()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
+
+
+def iter_maildir(path):
+    for subdir in ("cur", "new"):
+        directory = os.path.join(path, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.startswith("."):
+                yield read_message_file(os.path.join(directory, name))
+
+
+def iter_eml_directory(path):
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith(EML_SUFFIXES):
+                yield read_message_file(os.path.join(root, name))
+
+
+def iter_archive(path):
+    """Отдает сырые письма из mbox-файла, каталога Maildir или каталога с .eml-файлами"""
+    if os.path.isfile(path):
+        return iter_mbox(path)
+    if os.path.isdir(os.path.join(path, "cur")):
+        return iter_maildir(path)
+    if os.path.isdir(path):
+        return iter_eml_directory(path)
+    raise FileNotFoundError(f"Не найден архив писем: {path}")
+
+
+def init_worker():
+    """Инициализатор процесса пула разбора архива.
+
+    Лежит здесь, а не в команде backfill_archive: при методе запуска spawn (macOS, Windows)
+    процесс импортирует его до django.setup(), а модули с моделями до этого не импортируются.
+    """
+    django.setup()
+
+
+def archive_size(path):
+    """Общий размер файлов архива в байтах, для оценки скорости"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
@@ -0,0 +1,95 @@
+"""Локальные HTTP-заглушки OpenAI Chat Completions и Google Forms для bench_pipeline"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+SENDER_NAME_RE = re.compile(r"\*\*Sender Name \(from Google Account\):\*\* ([^\n]*?)\s*\n")
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0, host="127.0.0.1", port=0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def count(self, received):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += received
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у настоящих сервисов
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.count(len(body))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return body
+
+    def reply(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeOpenAIHandler(_Handler):
+    """Отвечает на POST /v1/chat/completions правдоподобным ответом gpt-4o"""
+
+    def do_POST(self):
+        request = json.loads(self.read_body() or b"{}")
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        match = SENDER_NAME_RE.search(prompt)
+        name = match.group(1).strip() if match else "Their"
+
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps({"name": name, "phone": "No phone", "website": "No website", "company": "No company"})
+        elif "company name" in prompt:
+            content = "No company"
+        elif "website" in prompt:
+            content = "No website"
+        else:
+            content = name
+
+        response = {
+            "id": f"chatcmpl-bench-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 10, "total_tokens": len(prompt) // 4 + 10},
+        }
+        self.reply(200, json.dumps(response).encode())
+
+
+class FakeFormsHandler(_Handler):
+    """Принимает ответы формы так же, как Google Forms: любой POST получает 200"""
+
+    def do_POST(self):
+        self.read_body()
+        self.reply(200, b"<html><body>OK</body></html>", content_type="text/html")
@@ -0,0 +1,219 @@
+"""Локальный IMAP-сервер для bench_pipeline: отдает письма из памяти по обычному TCP без SSL.
+
+Поддерживается только то, чем пользуется парсер: LOGIN, SELECT, UID SEARCH и UID FETCH
+с RFC822, RFC822.SIZE, BODYSTRUCTURE, BODY.PEEK[HEADER.FIELDS (...)] и BODY.PEEK[n]<0.N>.
+"""
+import email
+import re
+import socketserver
+import threading
+import time
+
+
+UID_VALIDITY = 1
+NEWLINE = b"\n"
+FETCH_ITEM_RE = re.compile(
+    r"BODY\.PEEK\[HEADER\.FIELDS \(([^)]*)\)\]|BODY\.PEEK\[([\d.]+)\](?:<0\.(\d+)>)?|BODYSTRUCTURE|RFC822\.SIZE|RFC822",
+    re.IGNORECASE,
+)
+
+
+def _quote(value):
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _params(part):
+    params = part.get_params()
+    if not params or len(params) < 2:
+        return "NIL"
+    return "(" + " ".join(f"{_quote(key)} {_quote(value)}" for key, value in params[1:]) + ")"
+
+
+def _disposition(part):
+    disposition = part.get("Content-Disposition")
+    if not disposition:
+        return "NIL"
+    kind = disposition.split(";")[0].strip()
+    filename = part.get_filename()
+    params = f'("filename" {_quote(filename)})' if filename else "NIL"
+    return f"({_quote(kind)} {params})"
+
+
+def bodystructure(part):
+    """Строит BODYSTRUCTURE письма в формате RFC 3501 (с расширенными полями)"""
+    if part.is_multipart():
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype())} {_params(part)} NIL NIL NIL)"
+
+    payload = part.get_payload().encode("utf-8", errors="surrogateescape")
+    encoding = part.get("Content-Transfer-Encoding", "7bit")
+    basic = (
+        f"{_quote(part.get_content_maintype())} {_quote(part.get_content_subtype())} {_params(part)} "
+        f"NIL NIL {_quote(encoding)} {len(payload)}"
+    )
+    if part.get_content_maintype() == "text":
+        basic += f" {payload.count(NEWLINE) + 1}"
+    return f"({basic} NIL {_disposition(part)} NIL NIL)"
+
+
+def section_payload(message, section):
+    """Тело секции n или n.m в том виде, в каком оно передается (без декодирования base64)"""
+    part = message
+    if message.is_multipart():
+        for index in section.split("."):
+            part = part.get_payload()[int(index) - 1]
+    elif section != "1":
+        return b""
+    return part.get_payload().encode("utf-8", errors="surrogateescape")
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, messages, latency=0.0, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeIMAPHandler)
+        self.messages = messages
+        self.latency = latency
+        self.bytes_sent = 0
+        self.commands = 0
+        self.connections = 0
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-imap", daemon=True).start()
+        return self
+
+    def parsed(self, uid):
+        with self._lock:
+            message = self._parsed.get(uid)
+        if message is None:
+            message = email.message_from_bytes(self.messages[uid])
+            with self._lock:
+                self._parsed[uid] = message
+        return message
+
+    def count(self, sent):
+        with self._lock:
+            self.bytes_sent += sent
+            self.commands += 1
+
+
+class FakeIMAPHandler(socketserver.StreamRequestHandler):
+    def send(self, data):
+        self.wfile.write(data)
+        return len(data)
+
+    def handle(self):
+        with self.server._lock:
+            self.server.connections += 1
+
+        self.send(b"* OK [CAPABILITY IMAP4rev1] bench IMAP ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            tag, _, rest = line.decode("utf-8", errors="replace").strip().partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            if self.server.latency:
+                time.sleep(self.server.latency)
+
+            sent = 0
+            if command == "CAPABILITY":
+                sent += self.send(f"* CAPABILITY IMAP4rev1\r\n{tag} OK CAPABILITY completed\r\n".encode())
+            elif command == "LOGIN":
+                sent += self.send(f"{tag} OK LOGIN completed\r\n".encode())
+            elif command in ("SELECT", "EXAMINE"):
+                uids = sorted(self.server.messages)
+                sent += self.send(
+                    f"* {len(uids)} EXISTS\r\n"
+                    f"* OK [UIDVALIDITY {UID_VALIDITY}] UIDs valid\r\n"
+                    f"* OK [UIDNEXT {(uids[-1] if uids else 0) + 1}] next UID\r\n"
+                    f"{tag} OK [READ-WRITE] SELECT completed\r\n".encode()
+                )
+            elif command == "UID":
+                sent += self.handle_uid(tag, args)
+            elif command in ("CLOSE", "NOOP"):
+                sent += self.send(f"{tag} OK {command} completed\r\n".encode())
+            elif command == "LOGOUT":
+                self.send(f"* BYE logging out\r\n{tag} OK LOGOUT completed\r\n".encode())
+                return
+            else:
+                sent += self.send(f"{tag} BAD unsupported command\r\n".encode())
+
+            self.server.count(sent)
+
+    def resolve_uids(self, message_set):
+        uids = sorted(self.server.messages)
+        selected = []
+        for part in message_set.split(","):
+            start, _, end = part.partition(":")
+            low = int(start)
+            high = (uids[-1] if uids else 0) if end == "*" else int(end or start)
+            if end == "*" and low > high:
+                low, high = high, low  # Диапазон n:* всегда включает последнее письмо
+            selected.extend(uid for uid in uids if low <= uid <= high)
+        return sorted(set(selected))
+
+    def handle_uid(self, tag, args):
+        subcommand, _, args = args.partition(" ")
+        subcommand = subcommand.upper()
+
+        if subcommand == "SEARCH":
+            criteria = args.split()
+            if criteria and criteria[0].upper() == "UID":
+                uids = self.resolve_uids(criteria[1])
+            else:
+                uids = sorted(self.server.messages)
+            return self.send(
+                f"* SEARCH {' '.join(map(str, uids))}\r\n{tag} OK SEARCH completed\r\n".encode()
+            )
+
+        if subcommand == "FETCH":
+            message_set, _, query = args.partition(" ")
+            items = list(FETCH_ITEM_RE.finditer(query))
+            sent = 0
+            for sequence, uid in enumerate(self.resolve_uids(message_set), start=1):
+                sent += self.send(self.fetch_response(sequence, uid, items))
+            return sent + self.send(f"{tag} OK FETCH completed\r\n".encode())
+
+        return self.send(f"{tag} BAD unsupported UID command\r\n".encode())
+
+    def fetch_response(self, sequence, uid, items):
+        raw = self.server.messages[uid]
+        parts = [f"* {sequence} FETCH (UID {uid}".encode()]
+
+        for item in items:
+            name = item.group(0).upper()
+            if name == "RFC822.SIZE":
+                parts.append(f" RFC822.SIZE {len(raw)}".encode())
+            elif name == "RFC822":
+                parts.append(f" RFC822 {{{len(raw)}}}\r\n".encode() + raw)
+            elif name == "BODYSTRUCTURE":
+                parts.append(f" BODYSTRUCTURE {bodystructure(self.server.parsed(uid))}".encode())
+            elif item.group(1) is not None:
+                message = self.server.parsed(uid)
+                fields = item.group(1).split()
+                header = "".join(
+                    f"{field}: {value}\r\n" for field in fields for value in (message.get_all(field) or [])
+                ).encode("utf-8", errors="surrogateescape") + b"\r\n"
+                parts.append(f" BODY[HEADER.FIELDS ({item.group(1)})] {{{len(header)}}}\r\n".encode() + header)
+            else:
+                body = section_payload(self.server.parsed(uid), item.group(2))
+                origin = ""
+                if item.group(3):
+                    body = body[:int(item.group(3))]
+                    origin = "<0>"
+                parts.append(f" BODY[{item.group(2)}]{origin} {{{len(body)}}}\r\n".encode() + body)
+
+        parts.append(b")\r\n")
+        return b"".join(parts)
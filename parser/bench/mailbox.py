@@ -0,0 +1,133 @@
+"""Генератор синтетического почтового ящика для bench_pipeline"""
+import random
+from datetime import datetime, timedelta, timezone
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+
+
+# Доля писем каждого вида в ящике
+DEFAULT_MIX = {
+    "newsletter": 0.35,  # HTML-рассылка с List-Unsubscribe, распознается по заголовкам
+    "notification": 0.15,  # Уведомление с no-reply адреса
+    "personal": 0.25,  # Обычное письмо с подписью, иногда с цитатой переписки
+    "attachment": 0.15,  # Письмо с PDF-вложением
+    "html_personal": 0.10,  # HTML-письмо с картинкой
+}
+SENDER_POOL_RATIO = 0.6  # Отправителей меньше, чем писем, чтобы работала фильтрация дубликатов
+BENCH_DOMAIN_SUFFIX = ".bench.test"
+
+FIRST_NAMES = ["John", "Maria", "Alex", "Olena", "David", "Sofia", "Peter", "Anna", "James", "Iryna"]
+LAST_NAMES = ["Smith", "Kovalenko", "Brown", "Garcia", "Muller", "Petrenko", "Wilson", "Rossi"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne", "Hooli", "Vandelay", "Soylent", "Tyrell"]
+LOREM = (
+    "We would like to follow up on the proposal we discussed last week and agree on the next steps. "
+    "Please let me know if the timeline still works for your team and whether you need anything else from us. "
+)
+
+
+def _company_domain(company):
+    return f"{company.lower()}{BENCH_DOMAIN_SUFFIX}"
+
+
+def _signature(rng, name, company):
+    return (
+        f"\n\nBest regards,\n{name}\n{company} Ltd.\n"
+        f"+1 {rng.randint(200, 999)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}\n"
+        f"https://www.{_company_domain(company)}"
+    )
+
+
+def _personal_text(rng, name, company):
+    text = f"Hi,\n\n{LOREM * rng.randint(1, 6)}{_signature(rng, name, company)}"
+    if rng.random() < 0.4:
+        quoted = "\n".join(f"> {line}" for line in (LOREM * rng.randint(2, 10)).split(". "))
+        text += f"\n\nOn Mon, Jan 1, 2024 at 10:00 AM Someone <someone@example.com> wrote:\n{quoted}"
+    return text
+
+
+def _newsletter_html(rng, company):
+    items = "".join(
+        f'<tr><td style="padding:8px"><a href="https://click.{_company_domain(company)}/t/{rng.getrandbits(128):x}'
+        f'?utm_source=newsletter&utm_medium=email">Offer {index}</a><p>{LOREM}</p></td></tr>'
+        for index in range(rng.randint(5, 40))
+    )
+    return (
+        "<html><head><style>td{font-family:Arial}.btn{color:#fff}</style></head><body>"
+        f"<table>{items}</table>"
+        f'<p>To stop receiving these emails, <a href="https://{_company_domain(company)}/unsubscribe">unsubscribe</a>.</p>'
+        "</body></html>"
+    )
+
+
+def _make_sender(rng, index):
+    company = rng.choice(COMPANIES)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if rng.random() < 0.2:
+        address = f"{name.split()[0].lower()}.{index}@gmail.com"
+    else:
+        address = f"{name.split()[0].lower()}.{index}@{_company_domain(company)}"
+    return name, address, company
+
+
+def _build_message(rng, kind, sender, sent_at, index):
+    name, address, company = sender
+
+    if kind == "newsletter":
+        msg = MIMEMultipart("alternative")
+        msg.attach(MIMEText(f"{company} news\n\n{LOREM * 3}", "plain", "utf-8"))
+        msg.attach(MIMEText(_newsletter_html(rng, company), "html", "utf-8"))
+        msg["From"] = f"{company} <news@{_company_domain(company)}>"
+        msg["List-Unsubscribe"] = f"<https://{_company_domain(company)}/unsubscribe>"
+        msg["List-Id"] = f"<news.{_company_domain(company)}>"
+        msg["Precedence"] = "bulk"
+    elif kind == "notification":
+        msg = MIMEText(f"Your order #{index} has been shipped.\n\nThis is an automated message, do not reply.", "plain", "utf-8")
+        msg["From"] = f"{company} <no-reply@{_company_domain(company)}>"
+    elif kind == "attachment":
+        msg = MIMEMultipart("mixed")
+        msg.attach(MIMEText(_personal_text(rng, name, company), "plain", rng.choice(["utf-8", "iso-8859-1"])))
+        pdf = MIMEApplication(rng.randbytes(rng.randint(100_000, 3_000_000)), "pdf")
+        pdf.add_header("Content-Disposition", "attachment", filename=f"document-{index}.pdf")
+        msg.attach(pdf)
+        msg["From"] = f"{name} <{address}>"
+    elif kind == "html_personal":
+        msg = MIMEMultipart("related")
+        body = _personal_text(rng, name, company).replace("\n", "<br>")
+        msg.attach(MIMEText(f"<html><body><div>{body}</div><img src=\"cid:logo\"></body></html>", "html", "utf-8"))
+        image = MIMEImage(rng.randbytes(rng.randint(20_000, 400_000)), "png")
+        image.add_header("Content-ID", "<logo>")
+        image.add_header("Content-Disposition", "inline", filename="logo.png")
+        msg.attach(image)
+        msg["From"] = f"{name} <{address}>"
+    else:
+        msg = MIMEText(_personal_text(rng, name, company), "plain", "utf-8")
+        msg["From"] = f"{name} <{address}>"
+
+    msg["Subject"] = f"{kind.replace('_', ' ').title()} #{index}"
+    msg["Date"] = format_datetime(sent_at)
+    msg["Message-ID"] = f"<bench-{index}-{rng.getrandbits(32):x}@bench.test>"
+    return msg.as_bytes()
+
+
+def generate_mailbox(count, seed=1, mix=None):
+    """Возвращает {UID: сырое письмо} из count писем; одинаковый seed дает одинаковый ящик"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = zip(*mix.items())
+
+    senders = {kind: [] for kind in kinds}
+    pool_size = max(1, int(count * SENDER_POOL_RATIO / len(kinds)))
+    started_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    messages = {}
+    for uid in range(1, count + 1):
+        kind = rng.choices(kinds, weights)[0]
+        pool = senders[kind]
+        if len(pool) < pool_size:
+            pool.append(_make_sender(rng, uid))
+        sender = rng.choice(pool)
+        messages[uid] = _build_message(rng, kind, sender, started_at + timedelta(minutes=uid), uid)
+    return messages
@@ -0,0 +1,146 @@
+"""Разбор ответов IMAP FETCH со структурой письма (BODYSTRUCTURE) и секциями BODY[...]"""
+import re
+
+
+FETCH_START_RE = re.compile(rb"^\d+ \(")
+TEXT_TYPES = ("text/plain", "text/html")
+
+
+def parse_sexp(data):
+    """Разбирает IMAP-выражение в списки: строки — str, литералы {n} — bytes, NIL — None.
+
+    Атом вида BODY[HEADER.FIELDS (FROM)]<0> читается целиком вместе со скобками.
+    """
+    stack = [[]]
+    pos = 0
+    length = len(data)
+
+    while pos < length:
+        char = data[pos:pos + 1]
+
+        if char in b" \r\n":
+            pos += 1
+        elif char == b"(":
+            stack.append([])
+            pos += 1
+        elif char == b")":
+            if len(stack) > 1:
+                item = stack.pop()
+                stack[-1].append(item)
+            pos += 1
+        elif char == b'"':
+            end = pos + 1
+            value = bytearray()
+            while end < length and data[end:end + 1] != b'"':
+                if data[end:end + 1] == b"\\":
+                    end += 1
+                value += data[end:end + 1]
+                end += 1
+            stack[-1].append(value.decode("utf-8", errors="replace"))
+            pos = end + 1
+        elif char == b"{":
+            end = data.index(b"}", pos)
+            size = int(data[pos + 1:end])
+            start = end + 1
+            if data[start:start + 2] == b"\r\n":
+                start += 2
+            stack[-1].append(data[start:start + size])
+            pos = start + size
+        else:
+            end = pos
+            depth = 0
+            while end < length:
+                current = data[end:end + 1]
+                if current == b"[":
+                    depth += 1
+                elif current == b"]":
+                    depth -= 1
+                elif depth == 0 and current in b" ()\r\n":
+                    break
+                end += 1
+            atom = data[pos:end].decode("ascii", errors="replace")
+            stack[-1].append(None if atom.upper() == "NIL" else atom)
+            pos = end
+
+    while len(stack) > 1:
+        item = stack.pop()
+        stack[-1].append(item)
+    return stack[0]
+
+
+def iter_fetch_items(msg_data):
+    """Отдает ответ UID FETCH по письмам: словарь {элемент: значение}, например {"UID": "5", "BODY[1]<0>": b"..."}"""
+    chunks = []
+
+    def flush():
+        parsed = parse_sexp(b"".join(chunks))
+        items = next((item for item in parsed if isinstance(item, list)), [])
+        return {str(key).upper(): value for key, value in zip(items[::2], items[1::2])}
+
+    for part in msg_data:
+        prefix = part[0] if isinstance(part, tuple) else part
+        if not isinstance(prefix, bytes):
+            continue
+
+        if FETCH_START_RE.match(prefix) and chunks:
+            yield flush()
+            chunks = []
+
+        # Литерал из кортежа imaplib возвращается на место, где в ответе стоял {n}
+        if isinstance(part, tuple):
+            chunks.append(prefix + b"\r\n" + part[1])
+        else:
+            chunks.append(prefix)
+
+    if chunks:
+        yield flush()
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value or ""
+
+
+def _params(value):
+    if not isinstance(value, list):
+        return {}
+    return {_text(key).lower(): _text(item) for key, item in zip(value[::2], value[1::2])}
+
+
+def find_text_part(structure, section=None):
+    """Ищет в BODYSTRUCTURE первую текстовую часть, которая не является вложением.
+
+    Возвращает словарь с номером секции, типом, кодировкой символов и
+    Content-Transfer-Encoding или None. Части вложенных писем (message/rfc822) не просматриваются.
+    """
+    if not isinstance(structure, list) or not structure:
+        return None
+
+    if isinstance(structure[0], list):
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break  # После частей идут подтип multipart и расширения
+            index += 1
+            found = find_text_part(child, f"{section}.{index}" if section else str(index))
+            if found:
+                return found
+        return None
+
+    content_type = f"{_text(structure[0])}/{_text(structure[1])}".lower()
+    if content_type not in TEXT_TYPES or len(structure) < 7:
+        return None
+
+    # У text/* после размера идет число строк, затем MD5 и Content-Disposition
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and _text(disposition[0]).lower() == "attachment":
+        return None
+
+    return {
+        "section": section or "1",
+        "content_type": content_type,
+        "charset": _params(structure[2]).get("charset"),
+        "encoding": _text(structure[5]).lower() or "7bit",
+        "size": int(structure[6]) if str(structure[6]).isdigit() else 0,
+    }
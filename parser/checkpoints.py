@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+
+from parser.imap_pool import build_message_set, expand_message_set
+from parser.models import ParsingJob
+
+
+CHECKPOINT_EVERY = 100  # Через сколько обработанных писем сохранять прогресс
+CHECKPOINT_INTERVAL = 10.0  # И не реже, чем раз в столько секунд
+JOB_MAX_ATTEMPTS = 3  # Сколько раз запускать задачу, прежде чем бросить ее и разобрать ящик заново
+
+logger = logging.getLogger(__name__)
+
+
+def find_active_job(account, mailbox, uid_validity):
+    """Возвращает незавершенную задачу для ящика или None и засчитывает ей новую попытку.
+
+    Задачи, начатые до смены UIDVALIDITY, закрываются: их UID больше ничего не значат.
+    Задача, которая не завершилась за JOB_MAX_ATTEMPTS запусков, помечается FAILED;
+    отметка синхронизации при этом не сдвигалась, поэтому новые письма найдутся заново.
+    """
+    jobs = ParsingJob.objects.filter(account=account, mailbox=mailbox, status=ParsingJob.ACTIVE)
+    jobs.exclude(uid_validity=uid_validity).update(status=ParsingJob.DONE)
+    job = jobs.filter(uid_validity=uid_validity).order_by("-created_at").first()
+    if job is None:
+        return None
+
+    if job.attempts >= JOB_MAX_ATTEMPTS:
+        logger.warning("⚠ Задача %s не завершилась за %s попыток, разбираю ящик заново", job.pk, job.attempts)
+        jobs.update(status=ParsingJob.FAILED)
+        return None
+
+    job.attempts += 1
+    job.save(update_fields=["attempts", "updated_at"])
+    return job
+
+
+class JobCheckpoint:
+    """Запоминает обработанные письма задачи и периодически сохраняет их в ParsingJob.
+
+    Перед записью вызывается flush, поэтому в сохраненную отметку попадают только
+    письма, которые уже отправлены: после перезапуска они не скачиваются и не
+    отправляются повторно.
+    """
+
+    def __init__(self, job, flush=None, every=CHECKPOINT_EVERY, interval=CHECKPOINT_INTERVAL):
+        self.job = job
+        self.every = every
+        self.interval = interval
+        self._flush = flush
+        self._processed = set(expand_message_set(job.processed_uids))
+        self.auto_mails = job.auto_mails
+        self.user_mails = job.user_mails
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    @property
+    def processed(self):
+        return len(self._processed)
+
+    def is_done(self, uid):
+        return int(uid) in self._processed
+
+    def mark(self, uid, is_automated):
+        """Отмечает письмо обработанным; время от времени сохраняет прогресс в базу.
+
+        is_automated=None — письма больше нет на сервере: оно считается обработанным,
+        но не попадает ни в автоматические, ни в пользовательские.
+        """
+        with self._lock:
+            if int(uid) in self._processed:
+                return
+            self._processed.add(int(uid))
+            if is_automated:
+                self.auto_mails += 1
+            elif is_automated is not None:
+                self.user_mails += 1
+
+            self._unsaved += 1
+            due = self._unsaved >= self.every or time.monotonic() - self._saved_at >= self.interval
+
+        if due:
+            self.save()
+
+    def save(self, status=None):
+        with self._save_lock:
+            with self._lock:
+                processed_uids = build_message_set(self._processed)
+                counters = (len(self._processed), self.auto_mails, self.user_mails)
+                self._unsaved = 0
+                self._saved_at = time.monotonic()
+
+            # Сначала дожидаемся отправки, потом записываем отметку
+            if self._flush is not None:
+                self._flush()
+
+            self.job.processed_uids = processed_uids
+            self.job.processed, self.job.auto_mails, self.job.user_mails = counters
+            if status:
+                self.job.status = status
+            self.job.save(update_fields=[
+                "processed_uids", "processed", "auto_mails", "user_mails", "status", "updated_at",
+            ])
@@ -0,0 +1,60 @@
+import codecs
+
+from parser.lazy import lazy_module
+
+
+chardet = lazy_module("chardet")
+
+DETECT_SAMPLE_BYTES = 32 * 1024  # Сколько байт тела отдавать chardet, если кодировку не удалось угадать
+
+# Кодировки, которые почтовые клиенты объявляют под устаревшими или неточными именами
+CHARSET_ALIASES = {
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+    "ks_c_5601-1987": "cp949",
+    "iso-8859-8-i": "iso-8859-8",
+    "windows-874": "cp874",
+    "x-user-defined": "cp1252",
+}
+
+
+def normalize_charset(charset):
+    """Возвращает имя кодировки, понятное Python, или None, если кодировка неизвестна"""
+    if not charset:
+        return None
+
+    charset = charset.strip().strip('"').lower()
+    charset = CHARSET_ALIASES.get(charset, charset)
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def decode_payload(raw_payload, declared_charset=None):
+    """Декодирует тело части письма, стараясь не вызывать chardet.
+
+    Порядок: кодировка из Content-Type, затем UTF-8 (она же покрывает ASCII),
+    и только если обе не подошли — chardet по первым DETECT_SAMPLE_BYTES байтам.
+    Оборванный в конце многобайтовый символ отбрасывается.
+    """
+    if not raw_payload:
+        return ""
+
+    charset = normalize_charset(declared_charset)
+    for candidate in filter(None, (charset, "utf-8")):
+        try:
+            return raw_payload.decode(candidate)
+        except UnicodeDecodeError as e:
+            # Тело, скачанное с ограничением по байтам, может обрываться посреди символа
+            if e.reason == "unexpected end of data" and e.end == len(raw_payload):
+                return raw_payload[:e.start].decode(candidate, errors="ignore")
+
+    detected = normalize_charset(chardet.get().detect(raw_payload[:DETECT_SAMPLE_BYTES])["encoding"])
+    return raw_payload.decode(detected or charset or "utf-8", errors="ignore")
+
+
+def decode_payload_chardet(raw_payload):
+    """Прежний способ: chardet по всему телу. Оставлен для сравнения в bench_decode"""
+    detected_encoding = chardet.get().detect(raw_payload)["encoding"]
+    return raw_payload.decode(detected_encoding if detected_encoding else "utf-8", errors="ignore")
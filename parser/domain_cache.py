@@ -0,0 +1,104 @@
+import re
+import threading
+
+from parser.local_extraction import FREE_MAIL_DOMAINS, LOCAL_CONFIDENCE_THRESHOLD, sender_domain, url_host
+from parser.models import DomainEnrichment
+
+
+DOMAIN_FIELDS = ("company", "website")
+LLM_ENRICHMENT_CONFIDENCE = 0.8  # Уверенность, с которой сохраняется ответ ChatGPT
+
+_MISSING = object()
+
+
+def enrichment_domain(sender_email):
+    """Домен, по которому можно кэшировать компанию и сайт; для бесплатной почты — пустая строка"""
+    domain = sender_domain(sender_email)
+    return "" if domain in FREE_MAIL_DOMAINS else domain
+
+
+# Части домена, которые ничего не говорят о компании
+GENERIC_DOMAIN_LABELS = {"www", "mail", "email", "co", "com", "org", "net", "gov", "edu", "ac"}
+MIN_COMPANY_LABEL_LENGTH = 3
+
+
+def _compact(value):
+    return re.sub(r"[^0-9a-z]", "", value.lower())
+
+
+def matches_domain(domain, field, value):
+    """Относится ли компания или сайт к домену отправителя.
+
+    Сайт подходит, если его хост совпадает с доменом или один вложен в другой;
+    компания — если в ее названии есть название домена (acme-corp.co.uk → "Acme Corp Ltd").
+    """
+    if not value:
+        return False
+    if field == "website":
+        host = url_host(value)
+        return bool(host) and (host == domain or host.endswith("." + domain) or domain.endswith("." + host))
+
+    company = _compact(value)
+    labels = [_compact(label) for label in domain.split(".")[:-1] if label not in GENERIC_DOMAIN_LABELS]
+    return any(len(label) >= MIN_COMPANY_LABEL_LENGTH and label in company for label in labels)
+
+
+class DomainEnrichmentCache:
+    """Компания и сайт по домену отправителя: в памяти процесса и в таблице DomainEnrichment.
+
+    Пока первое письмо домена разбирается, остальные письма того же домена ждут
+    в claim(), поэтому за компанию и сайт домена ChatGPT вызывается один раз.
+    """
+
+    def __init__(self, min_confidence=LOCAL_CONFIDENCE_THRESHOLD):
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self._entries = {}
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain):
+        """Возвращает {"company": ..., "website": ...} или None, если домен еще не известен"""
+        with self._lock:
+            entry = self._entries.get(domain, _MISSING)
+        if entry is _MISSING:
+            row = DomainEnrichment.objects.filter(domain=domain, confidence__gte=self.min_confidence).first()
+            entry = None
+            if row is not None:
+                row.save(update_fields=["last_seen"])  # Отмечаем домен один раз за процесс
+                entry = {field: getattr(row, field) for field in DOMAIN_FIELDS}
+            with self._lock:
+                self._entries[domain] = entry
+
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+        return entry
+
+    def claim(self, domain):
+        with self._lock:
+            return self._claims.setdefault(domain, threading.Lock())
+
+    def remember(self, domain, company, website, confidence):
+        """Сохраняет найденные компанию и сайт домена; пустые значения не затирают известные.
+
+        Значение, которое не совпадает с доменом (например, компания из подписи на домене
+        провайдера), не сохраняется: иначе оно досталось бы всем отправителям домена.
+        """
+        values = {
+            field: value for field, value in (("company", company), ("website", website))
+            if matches_domain(domain, field, value)
+        }
+        if not values or confidence < self.min_confidence:
+            return
+
+        row, created = DomainEnrichment.objects.get_or_create(domain=domain, defaults=dict(values, confidence=confidence))
+        if not created:
+            for field, value in values.items():
+                if not getattr(row, field) or confidence >= row.confidence:
+                    setattr(row, field, value)
+            row.confidence = max(row.confidence, confidence)
+            row.save()
+
+        with self._lock:
+            self._entries[domain] = {field: getattr(row, field) for field in DOMAIN_FIELDS}
@@ -0,0 +1,97 @@
+"""Обработчики команд Telegram-бота; общие для long polling и webhook"""
+from django.conf import settings
+
+from parser.bot_instance import bot
+from parser.jobs import JobManager
+from parser.management.commands.parser_emails import get_emails
+from parser.profiling import profile_job
+
+jobs = JobManager()  # Очередь задач парсинга всех пользователей
+user_data = {}  # Хранилище данных пользователей
+
+@bot.message_handler(commands=["start"])
+def send_welcome(message):
+    bot.reply_to(
+        message,
+        "Привет! Я бот для парсинга Gmail.\n\n"
+        "Используйте /parse_emails для запуска, /status — чтобы узнать место в очереди, "
+        "/cancel — чтобы отменить парсинг.\n"
+        "/parse_emails profile сохраняет профиль задачи, если профилирование включено на сервере.",
+    )
+
+
+@bot.message_handler(commands=["parse_emails"])
+def request_email(message):
+    """Шаг 1: Запрашиваем email у пользователя"""
+    # Профиль снимается только по запросу и только если задан PARSER_PROFILE_DIR
+    profile = "profile" in message.text.split()[1:] and bool(settings.PARSER_PROFILE_DIR)
+    user_data[message.chat.id] = {"profile": profile}
+    bot.send_message(message.chat.id, "📧 Введите вашу почту Gmail:")
+    bot.register_next_step_handler(message, request_password)
+
+def request_password(message):
+    """Шаг 2: Запрашиваем пароль у пользователя"""
+    user_data.setdefault(message.chat.id, {})["email"] = message.text
+    bot.send_message(message.chat.id, "🔑 Введите пароль приложения (Google App Password):")
+    bot.register_next_step_handler(message, start_parsing)
+
+def start_parsing(message):
+    """Шаг 3: Ставим парсинг в очередь задач"""
+    chat_id = message.chat.id
+
+    credentials = user_data.pop(chat_id, None)
+    if not credentials or "email" not in credentials:
+        bot.reply_to(message, "⚠️ Сначала введите почту: /parse_emails")
+        return
+
+    job, position = jobs.submit(
+        chat_id, run_parsing, credentials["email"], message.text, profile=credentials.get("profile", False),
+        account=credentials["email"].strip().lower(),  # Один ящик не парсится двумя задачами одновременно
+    )
+    if job is None:
+        bot.reply_to(message, "⚠️ У вас уже слишком много задач в очереди. Дождитесь их завершения или используйте /cancel.")
+    elif position:
+        bot.send_message(chat_id, f"🕒 Парсинг поставлен в очередь. Ваше место: {position}")
+
+
+@bot.message_handler(commands=["status"])
+def send_status(message):
+    """Показывает, выполняется ли парсинг и какое место занимают задачи в очереди"""
+    running, positions = jobs.status(message.chat.id)
+
+    lines = []
+    if running is not None:
+        lines.append("⏳ Парсинг выполняется")
+    if positions:
+        lines.append("🕒 Места в очереди: " + ", ".join(str(position) for position in positions))
+    bot.reply_to(message, "\n".join(lines) or "✅ Активных задач нет")
+
+
+@bot.message_handler(commands=["cancel"])
+def cancel_parsing(message):
+    """Отменяет ожидающие задачи чата и останавливает выполняемую"""
+    cancelled = jobs.cancel(message.chat.id)
+    user_data.pop(message.chat.id, None)
+
+    if cancelled:
+        bot.reply_to(message, f"⛔ Отменено задач: {len(cancelled)}")
+    else:
+        bot.reply_to(message, "✅ Активных задач нет")
+
+def run_parsing(job, email, password, profile=False):
+    """Выполняет задачу парсинга в потоке из пула JobManager"""
+    chat_id = job.chat_id
+    profile_dir = settings.PARSER_PROFILE_DIR if profile else None
+
+    try:
+        bot.send_message(chat_id, "⏳ Начинаю парсинг...")
+        with profile_job(f"job-{job.id}", profile_dir, settings.PARSER_PROFILE_MODE):
+            result = get_emails(email, password, chat_id, cancel_event=job.cancel_event)  # Теперь передаем `chat_id`
+        if job.cancelled:
+            bot.send_message(chat_id, "⛔ Парсинг отменен.")
+        elif result is not None:
+            # Если проход не завершен, get_emails уже сообщил об этом
+            bot.send_message(chat_id, "✅ Данные успешно записаны в таблицу.")
+    except Exception as e:
+        bot.send_message(chat_id, f"⚠ Ошибка: {str(e)}")
+        raise
@@ -0,0 +1,294 @@
+import logging
+import queue
+import re
+import threading
+
+from parser.bodystructure import find_text_part, iter_fetch_items
+from parser.metrics import IMAP_FETCH_SECONDS, IMAP_FETCHED_BYTES
+
+
+IMAP_CONNECTIONS = 4
+IMAP_MAX_CONNECTIONS = 10  # Gmail разрешает до 15 одновременных IMAP-соединений на аккаунт, оставляем запас
+FETCH_BATCH_SIZE = 200  # Сколько писем запрашивать одной командой UID FETCH
+FETCH_BATCH_BYTES = 20 * 1024 * 1024  # Предел суммарного размера писем в одной команде
+SHARD_SIZE = FETCH_BATCH_SIZE  # Сколько UID в одном шарде
+PREFETCH_MESSAGES = 100  # Сколько скачанных писем может ждать обработки у каждого соединения
+TEXT_PART_MAX_BYTES = 128 * 1024  # Сколько байт текстовой части скачивать (None — целиком)
+TEXT_PART_HEADERS = ("SUBJECT", "FROM", "DATE", "MESSAGE-ID")
+QUEUE_POLL_INTERVAL = 0.5
+
+UID_RE = re.compile(rb"UID (\d+)")
+SIZE_RE = re.compile(rb"RFC822\.SIZE (\d+)")
+SHARD_DONE = object()
+# Сервер ответил на FETCH, но письма с таким UID уже нет (удалено). None означает ошибку соединения
+EXPUNGED = b""
+
+logger = logging.getLogger(__name__)
+
+
+def build_message_set(email_ids):
+    """Сжимает список UID писем в IMAP message set вида 1:500,502,510:600"""
+    numbers = sorted({int(email_id) for email_id in email_ids})
+    ranges = []
+
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+
+    return ",".join(f"{start}:{end}" if start != end else str(start) for start, end in ranges)
+
+
+def expand_message_set(message_set):
+    """Разворачивает message set вида 1:500,502 обратно в список UID"""
+    uids = []
+    for part in filter(None, message_set.split(",")):
+        start, _, end = part.partition(":")
+        uids.extend(range(int(start), int(end or start) + 1))
+    return uids
+
+
+def iter_fetch_responses(msg_data):
+    """Отдает пары (UID, данные) из ответа UID FETCH"""
+    for index, response_part in enumerate(msg_data):
+        if not isinstance(response_part, tuple):
+            continue
+
+        match = UID_RE.search(response_part[0])
+        # Некоторые серверы присылают UID после литерала с данными
+        if match is None and index + 1 < len(msg_data) and isinstance(msg_data[index + 1], bytes):
+            match = UID_RE.search(msg_data[index + 1])
+
+        if match:
+            yield match.group(1), response_part[1]
+
+
+def plan_batches(uids, sizes=None, batch_size=FETCH_BATCH_SIZE, max_batch_bytes=FETCH_BATCH_BYTES):
+    """Делит UID на команды FETCH не больше batch_size писем и max_batch_bytes байт"""
+    batch = []
+    batch_bytes = 0
+    for uid in uids:
+        size = (sizes or {}).get(uid, 0)
+        if batch and (len(batch) >= batch_size or batch_bytes + size > max_batch_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(uid)
+        batch_bytes += size
+
+    if batch:
+        yield batch
+
+
+def response_size(msg_data):
+    """Сколько байт занимает ответ imaplib на команду FETCH"""
+    size = 0
+    for response_part in msg_data or ():
+        if isinstance(response_part, tuple):
+            size += sum(len(value) for value in response_part if isinstance(value, bytes))
+        elif isinstance(response_part, bytes):
+            size += len(response_part)
+    return size
+
+
+def uid_fetch(mail, message_set, query, label):
+    """UID FETCH с замером времени и объема ответа; label — вид запроса в метриках"""
+    with IMAP_FETCH_SECONDS.time(query=label):
+        status, msg_data = mail.uid("FETCH", message_set, query)
+    IMAP_FETCHED_BYTES.inc(response_size(msg_data), query=label)
+    return status, msg_data
+
+
+def fetch_rfc822_batched(mail, uids, sizes=None, batch_size=FETCH_BATCH_SIZE, max_batch_bytes=FETCH_BATCH_BYTES):
+    """Скачивает письма пакетами: одна команда UID FETCH на batch_size писем.
+
+    Письма отдаются по одному в порядке uids. В памяти одновременно держится не больше
+    одного пакета, а если известны размеры (RFC822.SIZE), пакет ограничен и по байтам.
+    """
+    for batch in plan_batches(uids, sizes, batch_size, max_batch_bytes):
+        status, msg_data = uid_fetch(mail, build_message_set(batch), "(RFC822)", "rfc822")
+        if status != "OK":
+            raise RuntimeError(f"UID FETCH вернул {status}")
+
+        fetched = dict(iter_fetch_responses(msg_data))
+        del msg_data
+        for uid in batch:
+            yield uid, fetched.pop(uid, EXPUNGED)
+
+
+def trim_encoded(body, encoding):
+    """Обрезает неполный хвост у части, скачанной с ограничением по байтам"""
+    if encoding == "base64":
+        body = b"".join(body.split())
+        return body[:len(body) // 4 * 4]
+    if encoding == "quoted-printable":
+        return re.sub(rb"=[0-9A-Fa-f]?$", b"", body)
+    return body
+
+
+def build_text_message(header_bytes, part, body):
+    """Собирает из заголовков и текстовой части одночастное письмо, которое понимает parse_email"""
+    headers = (header_bytes or b"").rstrip(b"\r\n")
+    if part is None:
+        return headers + b"\r\n\r\n"
+
+    content_type = part["content_type"]
+    if part["charset"]:
+        content_type += f'; charset="{part["charset"]}"'
+    return (
+        (headers + b"\r\n" if headers else b"")
+        + f"Content-Type: {content_type}\r\nContent-Transfer-Encoding: {part['encoding']}\r\n\r\n".encode()
+        + body
+    )
+
+
+def fetch_text_parts(mail, uids, max_bytes=TEXT_PART_MAX_BYTES, batch_size=FETCH_BATCH_SIZE):
+    """Скачивает у писем только первую текстовую часть вместо RFC822 целиком.
+
+    Сначала одной командой загружается BODYSTRUCTURE пакета, затем письма группируются
+    по номеру нужной секции, и каждая группа скачивается одной командой
+    UID FETCH (BODY.PEEK[HEADER.FIELDS (...)] BODY.PEEK[n]<0.max_bytes>). Вложения не скачиваются.
+    Письма, структуру которых разобрать не удалось, скачиваются целиком.
+    """
+    header_query = f"BODY.PEEK[HEADER.FIELDS ({' '.join(TEXT_PART_HEADERS)})]"
+    partial = f"<0.{max_bytes}>" if max_bytes else ""
+
+    for batch in plan_batches(uids, batch_size=batch_size):
+        status, msg_data = uid_fetch(mail, build_message_set(batch), "(BODYSTRUCTURE)", "bodystructure")
+        if status != "OK":
+            raise RuntimeError(f"UID FETCH BODYSTRUCTURE вернул {status}")
+
+        parts = {}
+        for item in iter_fetch_items(msg_data):
+            if "UID" in item and "BODYSTRUCTURE" in item:
+                parts[str(item["UID"]).encode()] = find_text_part(item["BODYSTRUCTURE"])
+
+        by_section = {}
+        for uid in batch:
+            if uid in parts:
+                part = parts[uid]
+                by_section.setdefault(part["section"] if part else None, []).append(uid)
+
+        fetched = {}
+        for section, section_uids in by_section.items():
+            body_query = f" BODY.PEEK[{section}]{partial}" if section else ""
+            status, msg_data = uid_fetch(
+                mail, build_message_set(section_uids), f"({header_query}{body_query})", "text_part"
+            )
+            if status != "OK":
+                raise RuntimeError(f"UID FETCH вернул {status}")
+
+            for item in iter_fetch_items(msg_data):
+                uid = str(item.get("UID", "")).encode()
+                header_bytes = next((value for key, value in item.items() if key.startswith("BODY[HEADER")), b"")
+                body = next((value for key, value in item.items() if key.startswith(f"BODY[{section}]")), b"")
+                part = parts.get(uid)
+                if part and max_bytes and len(body or b"") >= max_bytes:
+                    body = trim_encoded(body, part["encoding"])
+                fetched[uid] = build_text_message(header_bytes, part, body or b"")
+
+        # Письма без BODYSTRUCTURE (ошибка разбора) скачиваются целиком
+        missing = [uid for uid in batch if uid not in parts]
+        if missing:
+            fetched.update(fetch_rfc822_batched(mail, missing))
+
+        for uid in batch:
+            yield uid, fetched.pop(uid, EXPUNGED)
+
+
+def _close(mail):
+    try:
+        mail.close()
+        mail.logout()
+    except Exception:
+        pass
+
+
+def _put(results, item, stop):
+    while not stop.is_set():
+        try:
+            results.put(item, timeout=QUEUE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch_worker(connect, shards, fetch, results, stop):
+    """Обрабатывает свои шарды в одном соединении; при обрыве переподключается один раз"""
+    mail = None
+    try:
+        for shard in shards:
+            remaining = list(shard)
+            for attempt in range(2):
+                if stop.is_set():
+                    return
+
+                done = 0
+                try:
+                    if mail is None:
+                        mail = connect()
+                    for message in fetch(mail, remaining):
+                        if not _put(results, message, stop):
+                            return
+                        done += 1
+                    remaining = []
+                    break
+                except Exception as e:
+                    logger.warning("⚠ Ошибка IMAP при загрузке писем: %s", e)
+                    remaining = remaining[done:]
+                    if mail is not None:
+                        _close(mail)
+                    mail = None
+
+            for uid in remaining:
+                if not _put(results, (uid, None), stop):
+                    return
+            if not _put(results, SHARD_DONE, stop):
+                return
+    finally:
+        if mail is not None:
+            _close(mail)
+
+
+def fetch_messages_parallel(connect, uids, connections=IMAP_CONNECTIONS, fetch=fetch_rfc822_batched,
+                            shard_size=SHARD_SIZE):
+    """Скачивает письма через несколько IMAP-соединений и отдает (uid, байты) в исходном порядке.
+
+    Шарды раздаются соединениям по кругу: соединение k получает шарды k, k + N, k + 2N...
+    Поэтому все соединения заняты, а порядок восстанавливается чтением очередей по кругу.
+    Если письмо скачать не удалось, вместо байтов отдается None, а если его уже нет на сервере — EXPUNGED.
+    """
+    shards = [uids[index:index + shard_size] for index in range(0, len(uids), shard_size)]
+    connections = max(1, min(connections, IMAP_MAX_CONNECTIONS, len(shards)))
+    if not shards:
+        return
+
+    stop = threading.Event()
+    result_queues = [queue.Queue(maxsize=PREFETCH_MESSAGES) for _ in range(connections)]
+    workers = [
+        threading.Thread(
+            target=_fetch_worker,
+            args=(connect, shards[worker_index::connections], fetch, result_queues[worker_index], stop),
+            name=f"imap-fetch-{worker_index}",
+            daemon=True,
+        )
+        for worker_index in range(connections)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for shard_index in range(len(shards)):
+            results = result_queues[shard_index % connections]
+            while True:
+                message = results.get()
+                if message is SHARD_DONE:
+                    break
+                yield message
+    finally:
+        # Если обработку прервали, останавливаем соединения, не дожидаясь остальных шардов
+        stop.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,174 @@
+import collections
+import itertools
+import logging
+import threading
+
+
+JOB_WORKERS = 3  # Сколько почтовых ящиков обрабатывается одновременно
+MAX_QUEUED_PER_CHAT = 3  # Сколько задач один чат может держать в очереди
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """Задача парсинга одного почтового ящика для одного чата"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, chat_id, target, args=(), kwargs=None, account=None):
+        self.id = next(Job._ids)
+        self.chat_id = chat_id
+        self.account = account
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.state = QUEUED
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class JobManager:
+    """Очередь задач парсинга с ограниченным пулом потоков.
+
+    У каждого чата своя очередь, чаты обслуживаются по кругу, и у одного чата
+    одновременно выполняется не больше одной задачи — поэтому пользователь с
+    несколькими ящиками не занимает все потоки. Задачи разных чатов с одним
+    и тем же ящиком (account) тоже выполняются по очереди: иначе обе продолжили бы
+    одну незавершенную ParsingJob и отправили бы каждый результат дважды.
+    Обработчик задачи получает саму задачу первым аргументом и должен проверять job.cancel_event.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued_per_chat=MAX_QUEUED_PER_CHAT):
+        self.workers = workers
+        self.max_queued_per_chat = max_queued_per_chat
+        self._pending = collections.OrderedDict()  # chat_id -> очередь задач; порядок ключей — порядок обхода
+        self._running = {}  # chat_id -> выполняемая задача
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def _start(self):
+        # Потоки запускаются при первой задаче, чтобы импорт модуля ничего не запускал
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"parse-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, chat_id, target, *args, account=None, **kwargs):
+        """Ставит задачу в очередь чата; возвращает (задача, место в очереди) или (None, None), если очередь полна.
+
+        Место 0 означает, что задача начнет выполняться сразу. Задача с account ждет,
+        пока не закончится выполняемая задача с тем же account.
+        """
+        with self._condition:
+            pending = self._pending.get(chat_id)
+            if pending is not None and len(pending) >= self.max_queued_per_chat:
+                return None, None
+
+            self._start()
+            job = Job(chat_id, target, args, kwargs, account=account)
+            self._pending.setdefault(chat_id, collections.deque()).append(job)
+            position = self._position(job)
+            self._condition.notify()
+            return job, position
+
+    def _schedule(self):
+        """Порядок, в котором будут запущены ожидающие задачи, если новых не появится"""
+        # Чат, у которого задача уже выполняется, после ее окончания уходит в конец круга
+        chats = sorted(self._pending, key=lambda chat_id: chat_id in self._running)
+        queues = [list(self._pending[chat_id]) for chat_id in chats]
+        order = []
+        for round_jobs in itertools.zip_longest(*queues):
+            order.extend(job for job in round_jobs if job is not None)
+        return order
+
+    def _position(self, job):
+        if job.state != QUEUED:
+            return 0
+
+        order = self._schedule()
+        free_workers = self.workers - len(self._running)
+        index = order.index(job)
+        # Задача чата, у которого уже что-то выполняется или ждет раньше нее, не стартует сразу
+        first_in_chat = self._pending[job.chat_id][0] is job
+        if index < free_workers and first_in_chat and not self._blocked(job):
+            return 0
+        return index + 1
+
+    def _blocked(self, job):
+        """Задача не может стартовать, пока выполняется задача ее чата или ее ящика"""
+        if job.chat_id in self._running:
+            return True
+        return job.account is not None and any(
+            running.account == job.account for running in self._running.values()
+        )
+
+    def _next_job(self):
+        for chat_id, jobs in self._pending.items():
+            if self._blocked(jobs[0]):
+                continue
+
+            job = jobs.popleft()
+            if jobs:
+                self._pending.move_to_end(chat_id)
+            else:
+                del self._pending[chat_id]
+            return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                job.state = RUNNING
+                self._running[job.chat_id] = job
+
+            try:
+                job.target(job, *job.args, **job.kwargs)
+                job.state = CANCELLED if job.cancelled else DONE
+            except Exception:
+                job.state = FAILED
+                logger.exception("⚠ Ошибка в задаче %s для чата %s", job.id, job.chat_id)
+            finally:
+                with self._condition:
+                    self._running.pop(job.chat_id, None)
+                    if job.chat_id in self._pending:
+                        self._pending.move_to_end(job.chat_id)
+                    self._condition.notify_all()
+
+    def cancel(self, chat_id):
+        """Отменяет задачи чата: ожидающие убираются из очереди, выполняемой посылается сигнал.
+
+        Возвращает список затронутых задач.
+        """
+        with self._condition:
+            cancelled = list(self._pending.pop(chat_id, ()))
+            for job in cancelled:
+                job.cancel_event.set()
+                job.state = CANCELLED
+
+            running = self._running.get(chat_id)
+            if running is not None:
+                running.cancel_event.set()
+                cancelled.insert(0, running)
+            return cancelled
+
+    def status(self, chat_id):
+        """Возвращает выполняемую задачу чата и места в очереди его ожидающих задач"""
+        with self._condition:
+            running = self._running.get(chat_id)
+            positions = [self._position(job) for job in self._pending.get(chat_id, ())]
+            return running, positions
@@ -0,0 +1,29 @@
+import importlib
+import threading
+
+
+class LazyLoader:
+    """Создает тяжелый объект при первом обращении; безопасно при вызове из нескольких потоков"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+
+def lazy_module(name):
+    """Откладывает импорт модуля до первого вызова get()"""
+    return LazyLoader(lambda: importlib.import_module(name))
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+CACHE_PATH = settings.BASE_DIR / "llm_cache.sqlite3"
+CACHE_MAX_ENTRIES = 50000
+CACHE_MAX_AGE = 60 * 60 * 24 * 90  # 90 дней
+EVICT_EVERY_WRITES = 500  # Как часто проверять размер кэша
+
+
+class ExtractionCache:
+    """Кэш ответов OpenAI на диске, адресуемый по хэшу содержимого письма"""
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, max_age=CACHE_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, prompt_version, sender_name, sender_email, body):
+        """Хэш от модели, версии промпта, отправителя и тела письма без лишних пробелов"""
+        normalized_body = " ".join((body or "").split())
+        payload = json.dumps(
+            [model, prompt_version, sender_name or "", (sender_email or "").lower(), normalized_body],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS extraction_cache_accessed_at ON extraction_cache (accessed_at)"
+            )
+            self._evict()
+        return self._connection
+
+    def get(self, key):
+        """Возвращает сохраненный ответ или None, учитывая попадания и промахи"""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, created_at FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            now = time.time()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+
+            connection.execute("UPDATE extraction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            connection.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            connection.commit()
+
+            self._writes += 1
+            if self._writes % EVICT_EVERY_WRITES == 0:
+                self._evict()
+
+    def _evict(self):
+        """Удаляет устаревшие записи и самые давно использованные сверх лимита"""
+        connection = self._connection
+        connection.execute("DELETE FROM extraction_cache WHERE created_at < ?", (time.time() - self.max_age,))
+        connection.execute(
+            "DELETE FROM extraction_cache WHERE key IN ("
+            "SELECT key FROM extraction_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        connection.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
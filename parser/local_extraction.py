@@ -0,0 +1,175 @@
+import re
+
+
+NER_BATCH_SIZE = 64  # Сколько писем прогонять через spaCy за один вызов nlp.pipe
+NER_MAX_CHARS = 4000  # Из длинного письма берем начало и конец, где обычно подпись
+LOCAL_CONFIDENCE_THRESHOLD = 0.6  # Ниже этого порога поле уточняется через ChatGPT
+SIGNATURE_LINES = 12
+
+PHONE_RE = re.compile(r"(?<![\w+])\+?\(?\d[\d\s().-]{7,18}\d(?!\w)")
+URL_RE = re.compile(r"\b(?:https?://|www\.)[^\s<>\"')\]]+", re.IGNORECASE)
+GREETING_RE = re.compile(r"^\s*(?:hi|hello|hey|dear|good (?:morning|afternoon|evening))\b[^\n]*", re.IGNORECASE)
+NAME_RE = re.compile(r"^[^\W\d_]+(?:[ '-][^\W\d_]+){0,3}$")
+
+SOCIAL_DOMAINS = (
+    "gmail.com", "google.com", "linkedin.com", "facebook.com", "instagram.com",
+    "twitter.com", "x.com", "youtube.com", "t.me", "wa.me",
+)
+# Публичные почтовые сервисы и провайдеры: по их домену нельзя судить о компании отправителя
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "outlook.com", "outlook.fr", "outlook.de", "hotmail.com", "hotmail.co.uk",
+    "hotmail.fr", "hotmail.de", "hotmail.it", "live.com", "live.co.uk", "live.fr", "msn.com",
+    "yahoo.com", "yahoo.co.uk", "yahoo.fr", "yahoo.de", "yahoo.it", "yahoo.es", "yahoo.ca", "yahoo.com.au",
+    "ymail.com", "rocketmail.com", "icloud.com", "me.com", "mac.com", "aol.com", "proton.me", "protonmail.com",
+    "pm.me", "tutanota.com", "zoho.com", "zohomail.com", "fastmail.com", "hey.com", "mail.com", "email.com",
+    "gmx.com", "gmx.net", "gmx.de", "web.de", "t-online.de", "freenet.de", "orange.fr", "wanadoo.fr", "free.fr",
+    "laposte.net", "sfr.fr", "libero.it", "virgilio.it", "btinternet.com", "sky.com", "virginmedia.com",
+    "comcast.net", "att.net", "sbcglobal.net", "verizon.net", "bellsouth.net", "cox.net", "charter.net",
+    "earthlink.net", "optonline.net", "shaw.ca", "rogers.com", "bigpond.com", "qq.com", "163.com", "126.com",
+    "naver.com", "yandex.ru", "yandex.com", "ya.ru", "mail.ru", "bk.ru", "inbox.ru", "list.ru", "rambler.ru",
+    "ukr.net", "i.ua", "meta.ua", "seznam.cz", "wp.pl", "o2.pl", "interia.pl",
+}
+
+
+def sender_domain(sender_email):
+    """Домен из адреса отправителя в нижнем регистре"""
+    if not sender_email or "@" not in sender_email:
+        return ""
+    return sender_email.rsplit("@", 1)[1].strip().lower()
+
+
+def url_host(url):
+    """Хост ссылки без схемы, www. и порта в нижнем регистре"""
+    domain = re.sub(r"^(?:https?://)?(?:www\.)?", "", url, flags=re.IGNORECASE)
+    return domain.split("/", 1)[0].split(":", 1)[0].lower()
+
+
+def _prepare_text(body):
+    if len(body) <= NER_MAX_CHARS:
+        return body
+    half = NER_MAX_CHARS // 2
+    return body[:half] + "\n" + body[-half:]
+
+
+def _signature_zone(text):
+    lines = [line for line in text.splitlines() if line.strip()]
+    return "\n".join(lines[-SIGNATURE_LINES:])
+
+
+def _clean_entity(text):
+    return " ".join(text.replace("\n", " ").split()).strip(" ,.;:-")
+
+
+def _extract_name(doc, text, signature, sender_name, sender_email):
+    greeting = GREETING_RE.match(text)
+    greeting = greeting.group(0) if greeting else ""
+    local_part = (sender_email or "").split("@", 1)[0].lower()
+    display_name = (sender_name or "").strip()
+
+    best = (None, 0.0)
+    for ent in doc.ents:
+        if ent.label_ != "PERSON":
+            continue
+
+        name = _clean_entity(ent.text)
+        # Имя из приветствия — это получатель, а не отправитель
+        if not NAME_RE.match(name) or name in greeting:
+            continue
+
+        confidence = 0.3
+        if name in signature:
+            confidence += 0.3
+        tokens = [token.lower() for token in name.split()]
+        if any(len(token) > 2 and (token in local_part or token in display_name.lower()) for token in tokens):
+            confidence += 0.4
+
+        if confidence >= best[1]:
+            best = (name, min(confidence, 1.0))
+
+    # Отображаемое имя аккаунта, похожее на имя человека, подходит и без подтверждения в тексте
+    if display_name and "@" not in display_name and NAME_RE.match(display_name) and len(display_name.split()) >= 2:
+        if best[1] < 0.7:
+            best = (display_name, 0.7)
+
+    return best
+
+
+def _extract_company(doc, signature, sender_email):
+    domain_label = sender_domain(sender_email).split(".", 1)[0]
+
+    best = (None, 0.0)
+    for ent in doc.ents:
+        if ent.label_ != "ORG":
+            continue
+
+        company = _clean_entity(ent.text)
+        if not company or len(company) > 80:
+            continue
+
+        confidence = 0.3
+        if company in signature:
+            confidence += 0.2
+        squashed = re.sub(r"[^a-z0-9]", "", company.lower())
+        if domain_label and len(domain_label) > 2 and (domain_label in squashed or squashed in domain_label):
+            confidence += 0.4
+
+        if confidence >= best[1]:
+            best = (company, min(confidence, 1.0))
+
+    return best
+
+
+def _extract_phone(text, signature):
+    for zone, confidence in ((signature, 0.9), (text, 0.7)):
+        for match in PHONE_RE.finditer(zone):
+            phone = match.group(0).strip()
+            digits = re.sub(r"\D", "", phone)
+            if 9 <= len(digits) <= 15:
+                return phone, confidence
+
+    # Регулярное выражение ловит почти все форматы, поэтому отсутствие номера — надежный ответ
+    return "No phone", 0.7
+
+
+def _extract_website(text, sender_email):
+    domain = sender_domain(sender_email)
+
+    fallback = None
+    for match in URL_RE.finditer(text):
+        url = match.group(0).rstrip(".,;:")
+        url_domain = url_host(url)
+        if any(url_domain == social or url_domain.endswith("." + social) for social in SOCIAL_DOMAINS):
+            continue
+        if domain and (url_domain == domain or url_domain.endswith("." + domain)):
+            return url, 0.9
+        if fallback is None:
+            fallback = url
+
+    if fallback:
+        return fallback, 0.6
+    if domain and domain not in FREE_MAIL_DOMAINS:
+        return f"https://{domain}", 0.7
+    return "No website", 0.7
+
+
+def extract_local_contacts(nlp, items, batch_size=NER_BATCH_SIZE):
+    """Извлекает контакты без сети: PERSON/ORG через spaCy, телефон и сайт регулярными выражениями.
+
+    items — список кортежей (тело, имя отправителя, email отправителя).
+    Возвращает для каждого письма словарь {поле: (значение или None, уверенность)}.
+    """
+    texts = [_prepare_text(body) for body, _, _ in items]
+    disable = [name for name in nlp.pipe_names if name not in ("tok2vec", "ner")]
+
+    contacts = []
+    docs = nlp.pipe(texts, batch_size=batch_size, disable=disable)
+    for doc, text, (_, sender_name, sender_email) in zip(docs, texts, items):
+        signature = _signature_zone(text)
+        contacts.append({
+            "name": _extract_name(doc, text, signature, sender_name, sender_email),
+            "phone": _extract_phone(text, signature),
+            "website": _extract_website(text, sender_email),
+            "company": _extract_company(doc, signature, sender_email),
+        })
+
+    return contacts
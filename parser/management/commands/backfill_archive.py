@@ -0,0 +1,142 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from django import db
+from django.core.management import BaseCommand, CommandError
+
+from parser.archive import archive_size, init_worker, iter_archive
+from parser.local_extraction import NER_BATCH_SIZE
+from parser.management.commands import parser_emails as pe
+from parser.pipeline import Pipeline, Stage
+
+
+BACKFILL_CHUNKSIZE = NER_BATCH_SIZE  # Сколько писем отдавать процессу пула за раз; столько же идет в spaCy пачкой
+BACKFILL_IN_FLIGHT = 2000  # Сколько писем может быть прочитано, но еще не разобрано
+BACKFILL_REPORT_EVERY = 1000  # Как часто писать прогресс, в письмах
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает письма из архива (mbox из Google Takeout, Maildir или каталог с .eml) без IMAP: "
+        "разбор, классификация и spaCy идут в пуле процессов, запросы к OpenAI и сохранение — как в parser_emails"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="mbox-файл, каталог Maildir или каталог с .eml-файлами")
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                            help="Сколько процессов разбирают и классифицируют письма")
+        parser.add_argument("--concurrency", type=int, default=pe.LLM_CONCURRENCY,
+                            help="Сколько писем одновременно разбирается через OpenAI")
+        parser.add_argument("--output", choices=("forms", "db", "both"), default=pe.OUTPUT_MODE)
+        parser.add_argument("--limit", type=int, default=None, help="Сколько писем взять из архива")
+
+    def handle(self, *args, **options):
+        try:
+            messages = iter_archive(options["path"])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        if options["limit"]:
+            messages = itertools.islice(messages, options["limit"])
+
+        output = options["output"]
+        counters = {"read": 0, "bytes": 0, "skipped": 0, "auto": 0, "user": 0}
+        counters_lock = threading.Lock()
+
+        def save_stage(result):
+            pe.save_result(result, output)
+            with counters_lock:
+                counters["auto" if result["auto_gen"] else "user"] += 1
+
+        # Пул забирает задачи из генератора без ограничений, поэтому чтение архива
+        # придерживается семафором: не больше BACKFILL_IN_FLIGHT писем ждут разбора
+        slots = threading.Semaphore(BACKFILL_IN_FLIGHT)
+        stopped = threading.Event()
+
+        def read_batches():
+            batch = []
+            for raw_email in messages:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                with counters_lock:
+                    counters["read"] += 1
+                    counters["bytes"] += len(raw_email)
+                batch.append(raw_email)
+                if len(batch) == BACKFILL_CHUNKSIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        total_bytes = archive_size(options["path"])
+        self.stdout.write(
+            f"📂 Архив {options['path']}: {total_bytes / 1024 / 1024:.1f} МБ, процессов {options['processes']}"
+        )
+
+        db.connections.close_all()  # Соединение с базой не должно наследоваться процессами пула
+        started = time.perf_counter()
+        processed = 0
+        next_report = BACKFILL_REPORT_EVERY
+        # Процессы пула создаются fork до запуска потоков конвейера: иначе они унаследовали бы
+        # блокировки, захваченные чужими потоками в момент fork
+        with multiprocessing.Pool(options["processes"], initializer=init_worker) as pool:
+            # Разбор MIME, декодирование, правила и spaCy выполняются в пуле процессов;
+            # в этом процессе остаются запросы к OpenAI и отправка результатов
+            workers = dict(pe.PIPELINE_WORKERS, extract=options["concurrency"])
+            pipeline = Pipeline([
+                Stage("extract", pe.extract_stage, workers=workers["extract"]),
+                Stage("save", save_stage, workers=workers["save"]),
+            ]).start()
+            try:
+                try:
+                    for results in pool.imap_unordered(pe.prepare_raw_emails, read_batches()):
+                        for result in results:
+                            slots.release()
+                            processed += 1
+
+                            if result is None:
+                                with counters_lock:
+                                    counters["skipped"] += 1
+                            elif result["auto_gen"]:
+                                pipeline.put(result, stage="save")
+                            else:
+                                pipeline.put(result)
+
+                        if processed >= next_report:
+                            next_report += BACKFILL_REPORT_EVERY
+                            elapsed = time.perf_counter() - started
+                            logger.info(
+                                "📊 Разобрано %s писем (%.0f писем/с, %.1f МБ/с) | очереди: %s",
+                                processed, processed / elapsed, counters["bytes"] / 1024 / 1024 / elapsed,
+                                pipeline.describe_queues(),
+                            )
+                finally:
+                    # Поток пула, читающий архив, не должен остаться ждать семафор, иначе пул не закроется
+                    stopped.set()
+                    for _ in range(BACKFILL_IN_FLIGHT):
+                        slots.release()
+            finally:
+                pipeline.close()
+                pe.flush_sinks()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"\n✅ Загрузка архива завершена за {elapsed:.1f} с\n"
+            f"📨 Прочитано писем: {counters['read']} ({counters['bytes'] / 1024 / 1024:.1f} МБ, "
+            f"{counters['read'] / elapsed:.0f} писем/с)\n"
+            f"🤖 Автоматические письма: {counters['auto']}\n"
+            f"👤 Пользовательские письма: {counters['user']}\n"
+            f"⏭ Пропущено (без темы, отправителя или тела): {counters['skipped']}"
+        )
+
+        self.stdout.write("\nЗадержки стадий, мс:")
+        for stage in pipeline.stages:
+            percentiles = stage.latency_percentiles()
+            summary = ", ".join(f"p{p} {value * 1000:.1f}" for p, value in percentiles.items()) or "-"
+            self.stdout.write(f"  {stage.name:<8} писем {stage.processed}, ошибок {stage.errors}: {summary}")
@@ -0,0 +1,73 @@
+import email
+import itertools
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from parser.archive import iter_archive
+from parser.decoding import decode_payload, decode_payload_chardet
+
+
+TEXT_TYPES = ("text/plain", "text/html")
+
+
+def iter_raw_messages(path):
+    """Отдает сырые письма из mbox-файла, каталога Maildir или каталога с .eml-файлами"""
+    try:
+        return iter_archive(path)
+    except FileNotFoundError as e:
+        raise CommandError(str(e))
+
+
+def iter_text_parts(raw_messages):
+    """Отдает (тело части, объявленная кодировка) для текстовых частей писем"""
+    for raw in raw_messages:
+        msg = email.message_from_bytes(raw)
+        for part in msg.walk():
+            if part.get_content_type() in TEXT_TYPES and "attachment" not in str(part.get("Content-Disposition")):
+                payload = part.get_payload(decode=True)
+                if payload:
+                    yield payload, part.get_content_charset()
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость декодирования тел писем: chardet по всему телу против decode_payload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="mbox-файл, каталог Maildir или каталог с .eml-файлами")
+        parser.add_argument("--limit", type=int, default=None, help="Сколько писем взять из корпуса")
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        raw_messages = iter_raw_messages(options["path"])
+        if options["limit"]:
+            raw_messages = itertools.islice(raw_messages, options["limit"])
+        parts = list(iter_text_parts(raw_messages))
+        if not parts:
+            raise CommandError("В корпусе нет текстовых частей")
+
+        total_bytes = sum(len(payload) for payload, _ in parts)
+        self.stdout.write(f"📨 Текстовых частей: {len(parts)}, {total_bytes / 1024 / 1024:.1f} МБ")
+
+        candidates = [
+            ("chardet по всему телу", lambda payload, charset: decode_payload_chardet(payload)),
+            ("decode_payload", decode_payload),
+        ]
+        decoded = {}
+        for name, decode in candidates:
+            best = None
+            for _ in range(options["runs"]):
+                started = time.perf_counter()
+                results = [decode(payload, charset) for payload, charset in parts]
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            decoded[name] = results
+            self.stdout.write(
+                f"⏱ {name}: {best * 1000:.0f} мс, {total_bytes / 1024 / 1024 / best:.1f} МБ/с "
+                f"(лучший из {options['runs']})"
+            )
+
+        # Расхождения стоит просмотреть: чаще всего это письма, где chardet ошибался с кодировкой
+        old, new = decoded.values()
+        same = sum(1 for a, b in zip(old, new) if a == b)
+        self.stdout.write(f"🔎 Совпадающих результатов: {same} из {len(parts)}")
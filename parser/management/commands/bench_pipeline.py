@@ -0,0 +1,115 @@
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from django.core.management import BaseCommand, CommandError
+
+from parser.bench.http_fakes import FakeFormsHandler, FakeHTTPServer, FakeOpenAIHandler
+from parser.bench.imap_server import FakeIMAPServer
+from parser.bench.mailbox import BENCH_DOMAIN_SUFFIX, generate_mailbox
+from parser.imap_pool import IMAP_CONNECTIONS
+from parser.lazy import LazyLoader
+from parser.llm_cache import ExtractionCache
+from parser.management.commands import parser_emails as pe
+from parser.models import DomainEnrichment, MailboxSyncState, ParsingJob
+from parser.profiling import PROFILE_MODES, SAMPLING, profile_job
+from parser.throttling import RateLimiter
+
+
+BENCH_ACCOUNT_DOMAIN = "bench.test"
+PERCENTILES = (50, 90, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет get_emails на синтетическом ящике через локальные IMAP-сервер, OpenAI и Google Forms "
+        "и печатает пропускную способность и задержки стадий"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=1, help="Одинаковый seed дает одинаковый ящик")
+        parser.add_argument("--imap-latency", type=float, default=0.005, help="Задержка на команду IMAP, секунды")
+        parser.add_argument("--openai-latency", type=float, default=0.3, help="Задержка ответа OpenAI, секунды")
+        parser.add_argument("--forms-latency", type=float, default=0.1, help="Задержка ответа формы, секунды")
+        parser.add_argument("--connections", type=int, default=IMAP_CONNECTIONS)
+        parser.add_argument("--concurrency", type=int, default=pe.LLM_CONCURRENCY)
+        parser.add_argument("--fetch-mode", choices=("text_part", "rfc822"), default=pe.FETCH_MODE)
+        parser.add_argument("--verbose", action="store_true", help="Показывать сообщения парсера о каждом письме")
+        parser.add_argument("--profile", metavar="DIR", help="Сохранить профиль прогона в каталог")
+        parser.add_argument("--profile-mode", choices=PROFILE_MODES, default=SAMPLING)
+
+    def handle(self, *args, **options):
+        try:
+            pe.nlp.get()
+        except OSError as e:
+            raise CommandError(f"Не загружена модель spaCy {pe.SPACY_MODEL}: {e}")
+
+        self.stdout.write(f"📦 Генерирую ящик из {options['messages']} писем (seed {options['seed']})...")
+        messages = generate_mailbox(options["messages"], seed=options["seed"])
+        mailbox_bytes = sum(len(raw) for raw in messages.values())
+
+        imap = FakeIMAPServer(messages, latency=options["imap_latency"]).start()
+        openai_server = FakeHTTPServer(FakeOpenAIHandler, latency=options["openai_latency"]).start()
+        forms_server = FakeHTTPServer(FakeFormsHandler, latency=options["forms_latency"]).start()
+        account = f"bench-{uuid.uuid4().hex[:8]}@{BENCH_ACCOUNT_DOMAIN}"
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Парсер работает только с локальными заглушками; кэш OpenAI каждый раз пустой
+            pe.IMAP_SERVER = "127.0.0.1"
+            pe.IMAP_PORT = imap.port
+            pe.IMAP_SSL = False
+            pe.FETCH_MODE = options["fetch_mode"]
+            pe.FORM_URL_USER = f"{forms_server.url}/user/formResponse"
+            pe.FORM_URL_AUTO = f"{forms_server.url}/auto/formResponse"
+            pe.openai_client = LazyLoader(lambda: pe.openai.get().OpenAI(
+                base_url=f"{openai_server.url}/v1", api_key="bench", max_retries=0,
+            ))
+            pe.rate_limiter = RateLimiter(10 ** 6, 10 ** 9)
+            pe.extraction_cache = ExtractionCache(path=os.path.join(cache_dir, "llm_cache.sqlite3"))
+
+            parser_logger = logging.getLogger("parser")
+            previous_level = parser_logger.level
+            parser_logger.setLevel(logging.DEBUG if options["verbose"] else logging.WARNING)
+            try:
+                started = time.perf_counter()
+                with profile_job("bench", options["profile"], options["profile_mode"]) as profile_path:
+                    result = pe.get_emails(
+                        account, "bench", concurrency=options["concurrency"], connections=options["connections"],
+                    )
+                elapsed = time.perf_counter() - started
+            finally:
+                parser_logger.setLevel(previous_level)
+                MailboxSyncState.objects.filter(account=account).delete()
+                ParsingJob.objects.filter(account=account).delete()
+                DomainEnrichment.objects.filter(domain__endswith=BENCH_DOMAIN_SUFFIX).delete()
+                imap.shutdown()
+                openai_server.shutdown()
+                forms_server.shutdown()
+
+        if not result:
+            raise CommandError("get_emails не завершил проход, запустите с --verbose")
+
+        self.stdout.write(
+            f"\n⏱ {result['total']} писем за {elapsed:.2f} с: {result['total'] / elapsed:.1f} писем/с "
+            f"(🤖 {result['auto']}, 👤 {result['user']})"
+        )
+        self.stdout.write(
+            f"📥 Скачано по IMAP: {imap.bytes_sent / 1024 / 1024:.1f} МБ из {mailbox_bytes / 1024 / 1024:.1f} МБ в ящике, "
+            f"команд {imap.commands}, соединений {imap.connections}"
+        )
+        self.stdout.write(f"🧠 Запросов к OpenAI: {openai_server.requests}, ответов в форму: {forms_server.requests}")
+
+        if profile_path:
+            self.stdout.write(f"🔬 Профиль: {profile_path}")
+
+        self.stdout.write("\nЗадержки стадий, мс:")
+        self.stdout.write(f"  {'стадия':<10} {'писем':>7} {'ошибок':>7} " + " ".join(f"{'p' + str(p):>8}" for p in PERCENTILES))
+        for stage in result["stages"]:
+            percentiles = stage.latency_percentiles(PERCENTILES)
+            self.stdout.write(
+                f"  {stage.name:<10} {stage.processed:>7} {stage.errors:>7} "
+                + " ".join(f"{percentiles[p] * 1000:>8.1f}" if percentiles else f"{'-':>8}" for p in PERCENTILES)
+            )
@@ -0,0 +1,71 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+# Модули, которые не должны загружаться при старте бота
+HEAVY_MODULES = ("spacy", "openai", "chardet")
+
+STARTUP_CODE = "import django; django.setup(); import {module}"
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод python -X importtime: {модуль: накопленное время в микросекундах}"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+class Command(BaseCommand):
+    help = "Измеряет время холодного старта бота через python -X importtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15, help="Сколько самых медленных импортов показать")
+        parser.add_argument("--module", default="parser.management.commands.bot")
+        parser.add_argument("--max-ms", type=float, default=None,
+                            help="Завершиться с ошибкой, если медиана превышает порог")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "parse_emails.settings"))
+        code = STARTUP_CODE.format(module=options["module"])
+
+        timings = []
+        imports = {}
+        for _ in range(options["runs"]):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+
+            if completed.returncode != 0:
+                raise CommandError(completed.stderr.strip().splitlines()[-1])
+            imports = parse_importtime(completed.stderr)
+
+        median = statistics.median(timings)
+        self.stdout.write(
+            f"⏱ Холодный старт {options['module']}: медиана {median:.0f} мс, "
+            f"мин {min(timings):.0f} мс, макс {max(timings):.0f} мс ({options['runs']} запусков)"
+        )
+
+        self.stdout.write("\nСамые медленные импорты (накопленное время):")
+        for name, cumulative_us in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:options["top"]]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+
+        loaded_heavy = [name for name in HEAVY_MODULES if name in imports]
+        if loaded_heavy:
+            self.stdout.write(self.style.WARNING(f"\n⚠ При старте загружаются тяжелые модули: {', '.join(loaded_heavy)}"))
+
+        if options["max_ms"] is not None and median > options["max_ms"]:
+            raise CommandError(f"Медиана старта {median:.0f} мс превышает порог {options['max_ms']:.0f} мс")
@@ -1,68 +1,266 @@
 import imaplib
 import email
+import json
+import logging
 import re
+import threading
 import traceback
 from datetime import datetime
-from email.header import decode_header
-import requests
-import spacy
-from openai import OpenAI
-import chardet
+from functools import partial
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr
 
 from parser.bot_instance import bot
+from parser.checkpoints import JobCheckpoint, find_active_job
+from parser.decoding import decode_payload
+from parser.domain_cache import DOMAIN_FIELDS, LLM_ENRICHMENT_CONFIDENCE, DomainEnrichmentCache, enrichment_domain
+from parser.imap_pool import (
+    EXPUNGED,
+    IMAP_CONNECTIONS,
+    SIZE_RE,
+    UID_RE,
+    build_message_set,
+    fetch_messages_parallel,
+    fetch_rfc822_batched,
+    fetch_text_parts,
+    iter_fetch_responses,
+    uid_fetch,
+)
+from parser.lazy import LazyLoader, lazy_module
+from parser import metrics
+from parser.llm_cache import ExtractionCache
+from parser.local_extraction import LOCAL_CONFIDENCE_THRESHOLD, NER_BATCH_SIZE, extract_local_contacts
+from parser.models import MailboxSyncState, ParsingJob
+from parser.pipeline import Pipeline, Stage
+from parser.progress import ProgressReporter
+from parser.rules import RuleEngine, load_rules
+from parser.sinks import DatabaseSink, FormsSink, JobOutput
+from parser.text_normalize import BODY_TOKEN_BUDGET, normalize_email_body
+from parser.throttling import RateLimiter, estimate_tokens, retry_after_seconds
 
 
 IMAP_SERVER = "imap.gmail.com"
-nlp = spacy.load("en_core_web_sm")
+IMAP_PORT = 993
+IMAP_SSL = True  # Без SSL подключается только локальный тестовый сервер (bench_pipeline)
+IMAP_MAILBOX = "INBOX"
+HEADER_FETCH_BATCH_SIZE = 1000  # Сколько писем запрашивать одной командой FETCH при чтении заголовков
+DEDUP_HEADER_FIELDS = ("FROM", "DATE", "MESSAGE-ID")
+OPENAI_MODEL = "gpt-4o"
+HEADER_FIRST = True  # Распознавать очевидные рассылки по заголовкам, не скачивая тело
+FETCH_MODE = "text_part"  # "text_part" — только первая текстовая часть по BODYSTRUCTURE, "rfc822" — письмо целиком
+OUTPUT_MODE = "forms"  # Куда сохранять результаты: "forms", "db" или "both"
+LLM_CONCURRENCY = 8  # Сколько писем одновременно разбирается через OpenAI
+# Число потоков на каждой стадии конвейера get_emails
+PIPELINE_WORKERS = {
+    "parse": 2,
+    "classify": 1,
+    "normalize": 1,
+    "ner": 1,
+    "extract": LLM_CONCURRENCY,
+    "save": 1,
+}
+LLM_REQUESTS_PER_MINUTE = 500
+LLM_TOKENS_PER_MINUTE = 30000
+LLM_MAX_RETRIES = 5  # Повторы после ответа 429
+LLM_MAX_OUTPUT_TOKENS = 150  # Запас на ответ модели при оценке токенов запроса
+SPACY_MODEL = "en_core_web_sm"
+
+# Тяжелые зависимости загружаются при первом использовании, чтобы бот стартовал быстро
+spacy = lazy_module("spacy")
+openai = lazy_module("openai")
+nlp = LazyLoader(lambda: spacy.get().load(SPACY_MODEL))
+logger = logging.getLogger(__name__)
+classification_rules = LazyLoader(lambda: RuleEngine(load_rules()))
+
+# Значения по умолчанию, если модель не нашла поле в письме
+EXTRACTION_FALLBACKS = {
+    "name": "Their",
+    "phone": "No phone",
+    "website": "No website",
+    "company": "No company",
+}
+
+# Версии промптов входят в ключ кэша: при изменении промпта меняйте версию
+PROMPT_VERSIONS = {
+    "contact": "contact-v1",
+    "name": "name-v1",
+    "company": "company-v1",
+}
+
+openai_client = LazyLoader(lambda: openai.get().OpenAI(
+    # Повторы после 429 выполняет rate_limiter, чтобы учитывать Retry-After во всех потоках
+    max_retries=0,
+))
+extraction_cache = ExtractionCache()
+domain_enrichment = DomainEnrichmentCache()
+rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+forms_sink = FormsSink()
+database_sink = DatabaseSink()
+
+
+def classify_email(subject, sender, body, sent_at, message_id=None):
+    """Определяет, автоматическое ли письмо, и собирает результат для сохранения"""
+    logger.debug("Тема: %s | Отправитель: %s | Время отправки: %s", subject, sender, sent_at)
+
+    sender_name, sender_email = extract_sender_info(sender)
+
+    # Все правила проверяются одним проходом по тексту скомпилированным выражением
+    rule = classification_rules.get().classify(sender_email, body)
+    if rule:
+        logger.debug("🤖 Сработало правило: %s", rule)
+
+    return {
+        "sent_at": sent_at,
+        "sender_name": sender_name,
+        "sender_email": sender_email,
+        "content": body,
+        "message_id": message_id,
+        "auto_gen": rule is not None,
+        "rule": rule,
+    }
+
+
+def header_fields():
+    """Заголовки, которые загружаются в общем проходе: для дедупликации и правил"""
+    fields = list(DEDUP_HEADER_FIELDS) + ["SUBJECT"]
+    for name in classification_rules.get().header_names:
+        if name.upper() not in fields:
+            fields.append(name.upper())
+    return tuple(fields)
 
 
-def analyze_email_content(subject, sender, body, sent_at):
-    print(f"Тема: {subject}")
-    print(f"Отправитель: {sender}")
-    print(f"Время отправки: {sent_at}")
+def decode_header_value(value):
+    try:
+        return str(make_header(decode_header(value))) if value else ""
+    except Exception:
+        return str(value)
 
-    is_automated = False
 
+def classify_by_headers(headers):
+    """Распознает автоматическое письмо по одним заголовкам.
+
+    Возвращает результат для сохранения или None, если решить нельзя и нужно скачивать тело.
+    """
+    sender = decode_header_value(headers.get("From"))
     sender_name, sender_email = extract_sender_info(sender)
 
-    if sender_email and ("no-reply" or "noreply") in sender_email.lower():
-        is_automated = True
-
-    if "unsubscribe" in body.lower():
-        is_automated = True
-
-    automated_phrases = [
-        "do not reply", "automated message", "click here",
-        "manage your preferences", "update your settings", "do not respond", "google"
-    ]
-    for phrase in automated_phrases:
-        if phrase in body.lower():
-            is_automated = True
-
-    if re.search(r"<html>|<body>|<div>", body, re.IGNORECASE):
-        is_automated = True
-
-    if is_automated:
-        send_to_google_forms(sent_at, sender_name, sender_email, body, auto_gen=True)
-    else:
-        sender_name = extract_name_from_email(body, sender_name, sender_email)
-        print(f"🎯 Извлеченное имя: {sender_name}")
-        phone = extract_phone_from_email(body, sender_name, sender_email)
-        domain = extract_website_from_email(body, sender_name, sender_email)
-        company_name = extract_company_name_from_email(body, sender_name, sender_email)
+    rule = classification_rules.get().classify_headers(headers, sender_email)
+    if rule is None:
+        return None
+
+    subject = decode_header_value(headers.get("Subject"))
+    logger.debug("Тема: %s | Отправитель: %s | 🤖 Сработало правило по заголовкам: %s", subject, sender, rule)
+
+    return {
+        "sent_at": parse_email_date(str(headers.get("Date", ""))),
+        "sender_name": sender_name,
+        "sender_email": sender_email,
+        # Тело не скачивается, поэтому в качестве содержимого сохраняется тема
+        "content": subject,
+        "message_id": str(headers.get("Message-ID", "")).strip() or None,
+        "auto_gen": True,
+        "rule": rule,
+    }
+
+
+def normalize_result(result):
+    """Готовит текст пользовательского письма для spaCy и ChatGPT; исходное содержимое не меняется"""
+    if "text" not in result:
+        result["text"], tokens_before, tokens_after = normalize_email_body(result["content"], BODY_TOKEN_BUDGET)
+        result["tokens_saved"] = tokens_before - tokens_after
+        logger.debug("✂ Токенов в теле письма от %s: %s → %s", result["sender_email"], tokens_before, tokens_after)
+    return result
+
+
+def enrich_user_result(result, local_contact=None):
+    """Дополняет результат пользовательского письма контактами отправителя"""
+    text = normalize_result(result)["text"]
+    if local_contact is None:
+        item = (text, result["sender_name"], result["sender_email"])
+        local_contact = extract_local_contacts(nlp.get(), [item])[0]
+
+    contact = extract_contact_details(
+        text, result["sender_name"], result["sender_email"], local_contact
+    )
+    result["sender_name"] = contact["name"]
+    logger.debug("🎯 Извлеченное имя: %s", result["sender_name"])
+    result.update(tel=contact["phone"], domain=contact["website"], company_name=contact["company"])
+    return result
+
+
+def parse_stage(item):
+    """Стадия конвейера: разбирает скачанное письмо"""
+    email_id, raw_email = item
+    subject, sender, date_str, body, message_id = parse_raw_email(raw_email)
+    return {
+        "uid": email_id,
+        "subject": subject,
+        "sender": sender,
+        "date_str": date_str,
+        "body": body,
+        "message_id": message_id,
+    }
+
+
+def normalize_stage(result):
+    """Стадия конвейера: переводит HTML в текст и укладывает пользовательское письмо в бюджет токенов"""
+    if result["auto_gen"]:
+        return result
+    return normalize_result(result)
+
+
+def ner_stage(batch):
+    """Стадия конвейера: прогоняет пользовательские письма пачкой через spaCy"""
+    user_results = [result for result in batch if not result["auto_gen"]]
+    if user_results:
+        items = [(result["text"], result["sender_name"], result["sender_email"]) for result in user_results]
+        try:
+            local_contacts = extract_local_contacts(nlp.get(), items)
+        except Exception as e:
+            logger.warning("⚠ Ошибка локального извлечения: %s", e)
+            # Пустой словарь: все поля будут уточнены через ChatGPT
+            local_contacts = [{} for _ in user_results]
+
+        for result, local_contact in zip(user_results, local_contacts):
+            result["local_contact"] = local_contact
+
+    return batch
+
+
+def extract_stage(result):
+    """Стадия конвейера: извлекает контакты из пользовательского письма"""
+    if result["auto_gen"]:
+        return result
+    return enrich_user_result(result, result.pop("local_contact", None))
+
+
+def save_result(result, output=OUTPUT_MODE, job_output=None):
+    """Отправляет результат разбора письма в Google Forms и/или в локальную базу.
+
+    С job_output (JobOutput) отправки учитываются отдельно для задачи, чтобы ее flush не ждал чужие.
+    """
+    metrics.EMAILS.inc(kind="auto" if result["auto_gen"] else "user")
+    if output in ("forms", "both"):
         send_to_google_forms(
-            sent_at,
-            sender_name,
-            sender_email,
-            body,
-            tel=phone,
-            domain=domain,
-            company_name=company_name,
-            auto_gen=False
+            result["sent_at"],
+            result["sender_name"],
+            result["sender_email"],
+            result["content"],
+            domain=result.get("domain", ""),
+            company_name=result.get("company_name", ""),
+            tel=result.get("tel", ""),
+            auto_gen=result["auto_gen"],
+            pending=job_output.pending if job_output is not None else None,
         )
+    if output in ("db", "both"):
+        (job_output.database if job_output is not None else database_sink).submit(result)
 
-    print("=" * 50)
-    return is_automated
+
+def flush_sinks():
+    """Дожидается отправки в Google Forms и записи в базу всех поступивших результатов"""
+    forms_sink.flush()
+    database_sink.flush()
 
 
 def extract_sender_info(sender):
@@ -81,10 +279,91 @@ def parse_email_date(date_str):
         return None
 
 
-# Получение данных письма
-def fetch_email_data(mail, email_id):
-    status, msg_data = mail.fetch(email_id, "(RFC822)")
-    return msg_data
+def connect_imap(user_email, user_password):
+    """Открывает IMAP-соединение и выбирает папку с входящими"""
+    mail = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT) if IMAP_SSL else imaplib.IMAP4(IMAP_SERVER, IMAP_PORT)
+    mail.login(user_email, user_password)
+    mail.select(IMAP_MAILBOX)
+    return mail
+
+
+def get_uid_validity(mail):
+    """Возвращает UIDVALIDITY выбранной папки"""
+    _, data = mail.response("UIDVALIDITY")
+    if data and data[0]:
+        return int(data[0])
+
+    status, data = mail.status(IMAP_MAILBOX, "(UIDVALIDITY)")
+    match = re.search(rb"UIDVALIDITY (\d+)", data[0])
+    return int(match.group(1))
+
+
+def search_new_uids(mail, sync_state, uid_validity):
+    """Ищет UID писем, пришедших после последнего запуска.
+
+    Если UIDVALIDITY изменился или запуска еще не было, возвращает все письма папки.
+    """
+    if sync_state is not None and sync_state.uid_validity == uid_validity:
+        status, messages = mail.uid("SEARCH", None, f"UID {sync_state.last_uid + 1}:*")
+        # Диапазон n:* всегда включает последнее письмо, даже если его UID меньше n
+        return [uid for uid in messages[0].split() if int(uid) > sync_state.last_uid]
+
+    status, messages = mail.uid("SEARCH", None, "ALL")
+    return messages[0].split()
+
+
+def save_sync_state(account, uid_validity, last_uid):
+    """Запоминает UIDVALIDITY и UID последнего обработанного письма"""
+    MailboxSyncState.objects.update_or_create(
+        account=account,
+        mailbox=IMAP_MAILBOX,
+        defaults={"uid_validity": uid_validity, "last_uid": last_uid},
+    )
+
+
+def fetch_headers(mail, email_ids, fields=DEDUP_HEADER_FIELDS, batch_size=HEADER_FETCH_BATCH_SIZE, sizes=None):
+    """Получает только указанные заголовки писем пакетами, не скачивая тела и вложения.
+
+    Если передан словарь sizes, в него записываются размеры писем (RFC822.SIZE).
+    Письма, которых нет в ответе OK, удалены с сервера. Если же сервер ответил NO
+    ("Some messages could not be FETCHed") и части писем нет, бросает RuntimeError:
+    пропустить их молча нельзя, иначе отметка UID уйдет дальше них.
+    """
+    query = f"({'RFC822.SIZE ' if sizes is not None else ''}BODY.PEEK[HEADER.FIELDS ({' '.join(fields)})])"
+    header_parser = BytesHeaderParser()
+    headers = {}
+
+    for start_index in range(0, len(email_ids), batch_size):
+        batch = email_ids[start_index:start_index + batch_size]
+        status, msg_data = uid_fetch(mail, build_message_set(batch), query, "headers")
+        msg_data = msg_data or []
+
+        # Вместе с NO сервер присылает заголовки писем, которые получить удалось
+        for uid, header_bytes in iter_fetch_responses(msg_data):
+            headers[uid] = header_parser.parsebytes(header_bytes)
+
+        if status != "OK":
+            missing = [uid for uid in batch if uid not in headers]
+            if missing:
+                raise RuntimeError(f"UID FETCH заголовков вернул {status}, не получено писем: {len(missing)}")
+            logger.warning("⚠ UID FETCH заголовков вернул %s, но все письма получены", status)
+
+        if sizes is not None:
+            for response_part in msg_data:
+                if isinstance(response_part, tuple):
+                    uid_match = UID_RE.search(response_part[0])
+                    size_match = SIZE_RE.search(response_part[0])
+                    if uid_match and size_match:
+                        sizes[uid_match.group(1)] = int(size_match.group(1))
+
+    return headers
+
+
+def normalize_address(sender):
+    """Приводит адрес отправителя к единому виду: только email в нижнем регистре"""
+    _, address = parseaddr(sender)
+    address = address.strip().lower()
+    return address if address else sender.strip().lower()
 
 
 def parse_email(msg):
@@ -105,81 +384,141 @@ def parse_email(msg):
                 if content_type in ["text/plain", "text/html"] and "attachment" not in content_disposition:
                     try:
                         raw_payload = part.get_payload(decode=True)
-
-                        detected_encoding = chardet.detect(raw_payload)["encoding"]
-
-                        body = raw_payload.decode(detected_encoding if detected_encoding else "utf-8", errors="ignore")
+                        with metrics.OPERATION_SECONDS.time(operation="decode"):
+                            body = decode_payload(raw_payload, part.get_content_charset())
 
                     except Exception as e:
-                        print(f"⚠ Ошибка декодирования тела письма: {str(e)}")
+                        logger.warning("⚠ Ошибка декодирования тела письма: %s", e)
                     break
         else:
             content_type = msg.get_content_type()
             if content_type in ["text/plain", "text/html"]:
                 try:
                     raw_payload = msg.get_payload(decode=True)
-                    detected_encoding = chardet.detect(raw_payload)["encoding"]
-                    body = raw_payload.decode(detected_encoding if detected_encoding else "utf-8", errors="ignore")
+                    with metrics.OPERATION_SECONDS.time(operation="decode"):
+                        body = decode_payload(raw_payload, msg.get_content_charset())
                 except Exception as e:
-                    print(f"⚠ Ошибка декодирования тела письма: {str(e)}")
+                    logger.warning("⚠ Ошибка декодирования тела письма: %s", e)
 
         return subject, sender, date_str, body
 
     except Exception as e:
-        print(f"⚠ Ошибка парсинга письма: {str(e)}")
+        logger.warning("⚠ Ошибка парсинга письма: %s", e)
     return None, None, None, None
 
 
-def process_email(mail, email_id):
-    """Обрабатывает одно письмо, используя переданное IMAP-соединение"""
-    try:
-        status, msg_data = mail.fetch(email_id, "(RFC822)")
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                subject, sender, date_str, body = parse_email(msg)
+def parse_raw_email(raw_email):
+    """Разбирает сырое письмо: (тема, отправитель, дата, тело, Message-ID)"""
+    with metrics.OPERATION_SECONDS.time(operation="mime_parse"):
+        msg = email.message_from_bytes(raw_email)
+    subject, sender, date_str, body = parse_email(msg)
+    message_id = (msg.get("Message-ID") or "").strip()
+    return subject, sender, date_str, body, message_id or None
 
-                if not subject or not sender or not body:
-                    return False
 
-                sent_at = parse_email_date(date_str)
-                is_automated = analyze_email_content(subject, sender, body, sent_at)
+def classify_raw_email(raw_email):
+    """Разбирает, классифицирует и очищает письмо, ничего не сохраняя.
 
-                return is_automated
+    Только процессорная работа без сети и базы, поэтому выполняется в пуле процессов
+    backfill_archive. Возвращает результат для стадий ner → extract → save или None.
+    """
+    try:
+        subject, sender, date_str, body, message_id = parse_raw_email(raw_email)
+        if not subject or not sender or not body:
+            return None
+
+        result = classify_email(subject, sender, body, parse_email_date(date_str), message_id)
+        return normalize_stage(result)
 
     except Exception as e:
-        print(f"⚠ Ошибка при обработке письма {email_id}: {str(e)}")
+        logger.warning("⚠ Ошибка при обработке письма: %s", e)
+    return None
 
-    return False  # Если письмо не удалось обработать, считаем его пользовательским
 
+def prepare_raw_emails(raw_emails):
+    """Готовит пачку писем к стадиям extract → save: разбор, классификация, очистка и spaCy.
 
-def get_emails(user_email, user_password, chat_id=None):
-    """Парсит почту, открывая IMAP-соединение каждые 100 писем"""
+    Выполняется в процессе пула backfill_archive: spaCy работает сразу в нескольких
+    процессах, а модель загружается в каждом из них один раз. Возвращает результаты
+    в порядке raw_emails; None — письмо пропущено.
+    """
+    results = [classify_raw_email(raw_email) for raw_email in raw_emails]
+    ner_stage([result for result in results if result is not None])
+    return results
 
-    try:
-        # 1️⃣ Подключаемся к Gmail
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(user_email, user_password)
-        mail.select("inbox")
 
-        # 2️⃣ Получаем список всех писем
-        status, messages = mail.search(None, "ALL")
-        email_ids = messages[0].split()
+def get_emails(user_email, user_password, chat_id=None, concurrency=LLM_CONCURRENCY, output=OUTPUT_MODE,
+               connections=IMAP_CONNECTIONS, cancel_event=None):
+    """Парсит почту, скачивая письма параллельно через несколько IMAP-соединений.
 
-        print(f"✅ Найдено писем: {len(email_ids)}")
-        if chat_id:
-            bot.send_message(chat_id, f"📩 Найдено писем: {len(email_ids)}\nФильтрую письма...")
+    Если передан cancel_event, после его установки новые письма не скачиваются и не
+    классифицируются, уже начатые дообрабатываются, а отметка UID не сдвигается.
+    После полного прохода возвращает счетчики и стадии конвейера (для замеров);
+    если проход не завершен, возвращает None.
+    """
 
-        # 3️⃣ Фильтруем дубликаты, оставляя только последнее письмо от каждого отправителя
-        last_emails = filter_duplicates(email_ids, mail)
-        total_emails = len(last_emails)
+    try:
+        # 1️⃣ Подключаемся к Gmail
+        mail = connect_imap(user_email, user_password)
+
+        account = user_email.strip().lower()
+        uid_validity = get_uid_validity(mail)
+        job = find_active_job(account, IMAP_MAILBOX, uid_validity)
+        job_output = JobOutput()  # Контрольные точки ждут только отправок этой задачи
+        sizes = {}
+
+        if job is not None:
+            # 2️⃣ Продолжаем прерванную задачу: список писем уже отфильтрован,
+            # заголовки загружаются только для необработанных
+            checkpoint = JobCheckpoint(job, flush=job_output.flush)
+            last_emails = {sender: str(uid).encode() for sender, uid in job.last_emails.items()}
+            total_emails = len(last_emails)
+            remaining = [uid for uid in last_emails.values() if not checkpoint.is_done(uid)]
+            headers = fetch_headers(mail, remaining, fields=header_fields(), sizes=sizes)
+
+            message = f"🔁 Продолжаю прерванный парсинг: обработано {checkpoint.processed} из {total_emails} писем"
+            logger.info(message)
+            if chat_id:
+                bot.send_message(chat_id, message)
+        else:
+            # 2️⃣ Получаем список новых писем (или всех, если UIDVALIDITY изменился)
+            sync_state = MailboxSyncState.objects.filter(account=account, mailbox=IMAP_MAILBOX).first()
+            email_ids = search_new_uids(mail, sync_state, uid_validity)
 
-        print(f"✅ После фильтрации осталось {total_emails} писем")
-        if chat_id:
-            bot.send_message(chat_id, f"📩 После фильтрации осталось {total_emails} писем")
+            logger.info("✅ Найдено писем: %s", len(email_ids))
+            if chat_id:
+                bot.send_message(chat_id, f"📩 Найдено писем: {len(email_ids)}\nФильтрую письма...")
+
+            if not email_ids:
+                save_sync_state(account, uid_validity, sync_state.last_uid if sync_state else 0)
+                if chat_id:
+                    bot.send_message(chat_id, "✅ Новых писем нет")
+                return
+
+            # 3️⃣ Фильтруем дубликаты, оставляя только последнее письмо от каждого отправителя.
+            # Заголовки для правил загружаются тем же проходом
+            headers = fetch_headers(mail, email_ids, fields=header_fields(), sizes=sizes)
+            last_emails = filter_duplicates(email_ids, mail, headers)
+            total_emails = len(last_emails)
+
+            # ✅ Сохраняем задачу, чтобы после сбоя продолжить с последней отметки
+            job = ParsingJob.objects.create(
+                account=account,
+                mailbox=IMAP_MAILBOX,
+                uid_validity=uid_validity,
+                chat_id=chat_id,
+                last_emails={sender: int(uid) for sender, uid in last_emails.items()},
+                max_uid=max(int(uid) for uid in email_ids),
+                attempts=1,
+            )
+            checkpoint = JobCheckpoint(job, flush=job_output.flush)
+
+            logger.info("✅ После фильтрации осталось %s писем", total_emails)
+            if chat_id:
+                bot.send_message(chat_id, f"📩 После фильтрации осталось {total_emails} писем")
 
     except Exception as e:
-        print(f"⚠ Ошибка при подключении к Gmail: {str(e)}")
+        logger.warning("⚠ Ошибка при подключении к Gmail: %s", e)
         if chat_id:
             bot.send_message(chat_id, f"⚠ Ошибка подключения к Gmail: {str(e)}")
         return
@@ -192,54 +531,169 @@ def get_emails(user_email, user_password, chat_id=None):
         except:
             pass
 
-    # 4️⃣ Обрабатываем письма (открывая IMAP каждые 100 писем)
-    processed_emails = 0
+    # 4️⃣ Обрабатываем письма конвейером: разбор → классификация → очистка текста → spaCy → OpenAI → сохранение.
+    # Стадии связаны ограниченными очередями, поэтому медленная стадия притормаживает предыдущие
+    processed_emails = checkpoint.processed
     last_reported_percent = 0
-    auto_mails = 0
-    user_mails = 0
+    auto_mails = checkpoint.auto_mails
+    user_mails = checkpoint.user_mails
+    tokens_saved = 0
+    counters_lock = threading.Lock()
+
+    # Письма, обработанные до прерывания, пропускаются
+    email_list = [email_id for email_id in last_emails.values() if not checkpoint.is_done(email_id)]
+    fetch_failed = False
+
+    # ✅ Прогресс показывается в одном сообщении, которое отдельный поток редактирует не чаще раза в несколько секунд
+    progress = ProgressReporter(bot, chat_id, total_emails, processed=processed_emails).start() if chat_id else None
+
+    def is_cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def count_processed(is_automated):
+        """is_automated=None — письмо удалено с сервера и не попадает ни в одну из групп"""
+        nonlocal processed_emails, last_reported_percent, auto_mails, user_mails
+
+        with counters_lock:
+            processed_emails += 1
+            if is_automated:
+                auto_mails += 1
+            elif is_automated is not None:
+                user_mails += 1
+
+            if progress is not None:
+                progress.update(processed_emails)  # Не ждет Telegram
+
+            percent_complete = int((processed_emails / total_emails) * 100)
+
+            # ✅ В консоль статус пишется раз в 10% или через каждые 50 писем
+            if percent_complete >= last_reported_percent + 10 or processed_emails % 50 == 0:
+                logger.info(
+                    "📊 Выполнено: %s%% (%s/%s) | очереди: %s",
+                    percent_complete, processed_emails, total_emails, pipeline.describe_queues(),
+                )
+
+                last_reported_percent = percent_complete
+
+    def classify_stage(parsed):
+        if is_cancelled():
+            return None
+
+        if not parsed["subject"] or not parsed["sender"] or not parsed["body"]:
+            count_processed(False)  # Письмо без темы, отправителя или тела не сохраняется
+            checkpoint.mark(parsed["uid"], False)
+            return None
+
+        result = classify_email(
+            parsed["subject"],
+            parsed["sender"],
+            parsed["body"],
+            parse_email_date(parsed["date_str"]),
+            parsed["message_id"],
+        )
+        result["uid"] = parsed["uid"]
+        count_processed(result["auto_gen"])
+        return result
+
+    def save_stage(result):
+        nonlocal tokens_saved
+        save_result(result, output, job_output)
+        checkpoint.mark(result["uid"], result["auto_gen"])
+        with counters_lock:
+            tokens_saved += result.get("tokens_saved", 0)
+
+    workers = dict(PIPELINE_WORKERS, extract=concurrency)
+    pipeline = Pipeline([
+        Stage("parse", parse_stage, workers=workers["parse"]),
+        Stage("classify", classify_stage, workers=workers["classify"]),
+        Stage("normalize", normalize_stage, workers=workers["normalize"]),
+        Stage("ner", ner_stage, workers=workers["ner"], batch_size=NER_BATCH_SIZE),
+        Stage("extract", extract_stage, workers=workers["extract"]),
+        Stage("save", save_stage, workers=workers["save"]),
+    ]).start()
 
-    email_list = list(last_emails.values())  # Преобразуем dict_values в список
+    try:
+        # ✅ Очевидные рассылки решаются по уже загруженным заголовкам и сразу идут на сохранение
+        body_uids = []
+        for email_id in email_list:
+            if is_cancelled():
+                break
+
+            # Заголовков нет, если письмо удалили после поиска: это выяснится при загрузке тела
+            email_headers = headers.get(email_id)
+            result = classify_by_headers(email_headers) if HEADER_FIRST and email_headers is not None else None
+            if result is not None:
+                result["uid"] = email_id
+                count_processed(True)
+                pipeline.put(result, stage="save")
+            else:
+                body_uids.append(email_id)
+
+        # ✅ Тела скачиваются шардами через несколько соединений, по одной команде FETCH на пакет писем,
+        # и поступают в конвейер в исходном порядке. В режиме text_part скачивается только текстовая часть
+        messages = fetch_messages_parallel(
+            lambda: connect_imap(user_email, user_password),
+            body_uids,
+            connections,
+            fetch=fetch_text_parts if FETCH_MODE == "text_part" else partial(fetch_rfc822_batched, sizes=sizes),
+        )
+        for email_id, raw_email in messages:
+            if is_cancelled():
+                messages.close()  # Закрытие генератора останавливает IMAP-соединения
+                break
 
-    for start_index in range(0, total_emails, 100):  # Обрабатываем письма пакетами по 100
-        try:
-            # ✅ Открываем IMAP-соединение перед обработкой 100 писем
-            mail = imaplib.IMAP4_SSL("imap.gmail.com")
-            mail.login(user_email, user_password)
-            mail.select("inbox")
-
-            for index in range(start_index, min(start_index + 100, total_emails)):
-                email_id = email_list[index]
-                is_automated = process_email(mail, email_id)  # Передаем IMAP-соединение
-
-                processed_emails += 1
-                if is_automated:
-                    auto_mails += 1
-                else:
-                    user_mails += 1
+            if raw_email is None:
+                # Ошибка соединения: письмо останется необработанным и скачается при следующем запуске
+                fetch_failed = True
+                count_processed(False)
+                continue
 
-                percent_complete = int((processed_emails / total_emails) * 100)
+            if raw_email == EXPUNGED:
+                # Письма больше нет на сервере, повторять бесполезно
+                count_processed(None)
+                checkpoint.mark(email_id, None)
+                continue
 
-                # ✅ Обновление статуса раз в 10% или через каждые 50 писем
-                if percent_complete >= last_reported_percent + 10 or processed_emails % 50 == 0:
-                    message = f"📊 Выполнено: {percent_complete}% ({processed_emails}/{total_emails})"
-                    print(message)
-                    if chat_id:
-                        bot.send_message(chat_id, message)
+            pipeline.put((email_id, raw_email))
 
-                    last_reported_percent = percent_complete
+    except Exception as e:
+        fetch_failed = True
+        logger.warning("⚠ Ошибка при обработке писем: %s", e)
+        if chat_id:
+            bot.send_message(chat_id, f"⚠ Ошибка при обработке писем: {str(e)}")
 
-        except Exception as e:
-            print(f"⚠ Ошибка при обработке писем: {str(e)}")
-            if chat_id:
-                bot.send_message(chat_id, f"⚠ Ошибка при обработке писем: {str(e)}")
+    finally:
+        # ✅ Дожидаемся, пока конвейер обработает все письма, и отправки всех ответов
+        pipeline.close()
+        if progress is not None:
+            progress.close()
+
+        # ✅ Задача закрывается, только если каждое письмо дошло до отметки и парсинг не отменен.
+        # Письмо, на котором упала стадия конвейера, не отмечено: следующий запуск продолжит задачу и повторит его
+        stage_errors = sum(stage.errors for stage in pipeline.stages)
+        unmarked = sum(1 for email_id in email_list if not checkpoint.is_done(email_id))
+        if (stage_errors or unmarked) and not is_cancelled():
+            logger.warning("⚠ Ошибок на стадиях конвейера: %s, необработанных писем: %s", stage_errors, unmarked)
+        finished = not fetch_failed and not is_cancelled() and not stage_errors and not unmarked
+        checkpoint.save(status=ParsingJob.DONE if finished else None)
+
+    if is_cancelled():
+        logger.info("⛔ Парсинг отменен")
+        return
 
-        finally:
-            # ✅ Закрываем IMAP-соединение после обработки 100 писем
-            try:
-                mail.close()
-                mail.logout()
-            except:
-                pass
+    if not finished:
+        # Часть писем не скачалась или не обработалась: прежняя отметка UID остается, следующий запуск продолжит задачу
+        message = (
+            f"⚠ Парсинг не завершен: обработано {checkpoint.processed} из {total_emails} писем. "
+            f"Запустите парсинг еще раз, чтобы продолжить"
+        )
+        logger.warning(message)
+        if chat_id:
+            bot.send_message(chat_id, message)
+        return
+
+    # ✅ Запоминаем, до какого UID почта обработана
+    save_sync_state(account, uid_validity, job.max_uid)
 
     # ✅ Финальное сообщение с результатами
     final_message = (
@@ -249,88 +703,192 @@ def get_emails(user_email, user_password, chat_id=None):
         f"👤 Пользовательские письма: {user_mails}"
     )
 
-    print(final_message)
+    logger.info(final_message)
+    logger.info("✂ Сэкономлено токенов на очистке писем: %s", tokens_saved)
     if chat_id:
         bot.send_message(chat_id, final_message)
 
+    cache_stats = extraction_cache.stats()
+    logger.info(
+        "🗄 Кэш извлечения: попаданий %s, промахов %s, записей %s",
+        cache_stats["hits"], cache_stats["misses"], cache_stats["entries"],
+    )
+    logger.info("🏢 Компания и сайт взяты из кэша доменов: %s раз", domain_enrichment.hits)
+
+    return {
+        "total": total_emails,
+        "auto": auto_mails,
+        "user": user_mails,
+        "tokens_saved": tokens_saved,
+        "stages": pipeline.stages,
+    }
 
-def filter_duplicates(email_ids, mail):
+
+def filter_duplicates(email_ids, mail, headers=None):
+    """Оставляет последнее письмо от каждого отправителя, загружая только заголовки"""
     last_emails = {}
+    if headers is None:
+        headers = fetch_headers(mail, email_ids)
 
     for email_id in email_ids:
-        msg_data = fetch_email_data(mail, email_id)
-
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                _, sender, _, _ = parse_email(msg)
+        msg = headers.get(email_id)
+        if msg is None:
+            continue
 
-                if sender:
-                    last_emails[sender] = email_id
+        sender = msg.get("From")
+        if sender:
+            last_emails[normalize_address(str(sender))] = email_id
 
     return last_emails
 
 
 
-def extract_company_name_from_email(email_body, sender_name, sender_email):
-    try:
-        client = OpenAI()
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system",
-                 "content": "You are an advanced AI assistant that extracts the sender's company name from an email. "
-                            "Your response must contain ONLY the company name and nothing else. "
-                            "Follow these strict rules when extracting the company name:"},
-
-                {"role": "user",
-                 "content": f"""There is an email with the following content:
-
-                ------------------------------
-                **Sender Name (from Google Account):** {sender_name}  
-                **Sender Email Address:** {sender_email}  
-                **Email Body:**  
-                {email_body}
-                ------------------------------
-
-                **Extraction Rules:**
-                1️⃣ Try to find the company name in the **email body**, especially in the signature or footer.  
-                2️⃣ If the sender's name (from the Google Account) looks like a **company name**, use it.  
-                3️⃣ Do NOT confuse the recipient's company or referenced clients/partners with the sender’s company.  
-                4️⃣ If multiple companies are mentioned, choose the one clearly associated with the sender.  
-                5️⃣ If no valid company name is found, return exactly: `"No company"`
+def get_openai_client():
+    """Возвращает общий клиент OpenAI, создавая его при первом обращении"""
+    return openai_client.get()
 
-                **Important Output Rules:**
-                - Respond with ONLY the company name (e.g., `Acme Corp`)  
-                - Do NOT add punctuation, quotes, or any explanation  
-                - If no valid company is found, return exactly: `"No company"`
 
-                What is the sender's company name according to these rules?"""
-                 }
-            ],
-            temperature=0
-        )
+def is_valid_reply(content, validate):
+    if validate is None:
+        return True
+    try:
+        validate(content)
+    except Exception as e:
+        logger.debug("🔍 Ответ ChatGPT не прошел проверку и не кэшируется: %s", e)
+        return False
+    return True
 
-        company = response.choices[0].message.content.strip()
-        return company if company else "No company"
 
-    except Exception as e:
-        print(f"⚠ Error while getting ChatGPT: {str(e)}")
-        return "No company"
+def request_completion(prompt_version, email_body, sender_name, sender_email, messages, validate=None, **options):
+    """Отправляет запрос к ChatGPT или берет ответ из кэша, если это письмо уже разбиралось.
 
+    validate — функция, которая бросает исключение на непригодный ответ: такой ответ
+    возвращается вызывающему, но не попадает в кэш, а найденный в кэше запрашивается заново.
+    """
+    cache_key = ExtractionCache.make_key(OPENAI_MODEL, prompt_version, sender_name, sender_email, email_body)
+    content = extraction_cache.get(cache_key)
+    if content is not None and is_valid_reply(content, validate):
+        return content
 
-def extract_name_from_email(email_body, sender_name, sender_email):
+    request_tokens = sum(estimate_tokens(message["content"]) for message in messages) + LLM_MAX_OUTPUT_TOKENS
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        rate_limiter.acquire(request_tokens)
+        try:
+            with metrics.LLM_REQUEST_SECONDS.time(prompt=prompt_version):
+                response = get_openai_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0,
+                    **options
+                )
+            metrics.LLM_REQUESTS.inc(prompt=prompt_version, status="ok")
+            break
+        except openai.get().RateLimitError as e:
+            metrics.LLM_REQUESTS.inc(prompt=prompt_version, status="rate_limited")
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = retry_after_seconds(e) or 2 ** attempt
+            logger.warning("⚠ OpenAI rate limit, retrying in %.1fs", delay)
+            rate_limiter.pause(delay)
+        except Exception:
+            metrics.LLM_REQUESTS.inc(prompt=prompt_version, status="error")
+            raise
+
+    content = response.choices[0].message.content
+    if content is not None and is_valid_reply(content, validate):
+        extraction_cache.set(cache_key, content)
+    return content
+
+
+def extract_contact_details(email_body, sender_name, sender_email, local_contact):
+    """Берет контакты из кэша доменов и локального извлечения, уточняя через ChatGPT только неуверенные поля"""
+    domain = enrichment_domain(sender_email)
+    enrichment = domain_enrichment.get(domain) if domain else None
+    if not domain or enrichment is not None:
+        return resolve_contact_details(email_body, sender_name, sender_email, local_contact, enrichment)
+
+    # Первое письмо домена узнает компанию и сайт, остальные письма этого домена ждут и берут их из кэша
+    with domain_enrichment.claim(domain):
+        enrichment = domain_enrichment.get(domain)
+        contact = resolve_contact_details(email_body, sender_name, sender_email, local_contact, enrichment)
+        if enrichment is None:
+            found = {
+                field: contact[field] for field in DOMAIN_FIELDS if contact[field] != EXTRACTION_FALLBACKS[field]
+            }
+            confidences = []
+            for field, value in found.items():
+                local_value, local_confidence = local_contact.get(field, (None, 0.0))
+                # Уверенное локальное значение сохраняется со своей уверенностью, ответ ChatGPT — с фиксированной
+                if local_value == value and local_confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+                    confidences.append(local_confidence)
+                else:
+                    confidences.append(LLM_ENRICHMENT_CONFIDENCE)
+            domain_enrichment.remember(domain, found.get("company"), found.get("website"), min(confidences, default=0.0))
+        return contact
+
+
+def resolve_contact_details(email_body, sender_name, sender_email, local_contact, enrichment=None):
+    contact = {}
+    uncertain = []
+    for field, fallback in EXTRACTION_FALLBACKS.items():
+        value, confidence = local_contact.get(field, (None, 0.0))
+        if enrichment and enrichment.get(field):
+            value, confidence = enrichment[field], 1.0
+        contact[field] = value or fallback
+        if not value or confidence < LOCAL_CONFIDENCE_THRESHOLD:
+            uncertain.append(field)
+
+    if uncertain == ["name"]:
+        contact["name"] = extract_name_from_email(email_body, sender_name, sender_email)
+    elif uncertain == ["company"]:
+        contact["company"] = extract_company_name_from_email(email_body, sender_name, sender_email)
+    elif uncertain:
+        llm_contact = extract_contact_info(email_body, sender_name, sender_email)
+        for field in uncertain:
+            contact[field] = llm_contact[field]
+
+    return contact
+
+
+def load_contact_json(content):
+    """Разбирает ответ на запрос контактов; бросает ValueError, если это не JSON-объект"""
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError(f"ожидался JSON-объект, получен {type(data).__name__}")
+    return data
+
+
+def validate_contact_info(data):
+    """Проверяет ответ модели и подставляет значения по умолчанию для пустых полей"""
+    if not isinstance(data, dict):
+        data = {}
+
+    contact = {}
+    for field, fallback in EXTRACTION_FALLBACKS.items():
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip().strip('"`').strip()
+        contact[field] = value if isinstance(value, str) and value else fallback
+
+    return contact
+
+
+def extract_contact_info(email_body, sender_name, sender_email):
+    """Извлекает имя, телефон, сайт и компанию отправителя одним запросом к ChatGPT"""
     try:
-        client = OpenAI()
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        content = request_completion(
+            PROMPT_VERSIONS["contact"],
+            email_body,
+            sender_name,
+            sender_email,
+            response_format={"type": "json_object"},
+            validate=load_contact_json,
             messages=[
                 {"role": "system",
-                 "content": "You are an advanced AI assistant that extracts the sender's name from an email. "
-                            "Your response must contain ONLY the sender's name and nothing else. "
-                            "Follow these strict rules when extracting the name:"},
+                 "content": "You are an advanced AI assistant that extracts the sender's contact details from an email. "
+                            "Your response must be a single JSON object with the keys "
+                            "\"name\", \"phone\", \"website\" and \"company\" and nothing else. "
+                            "Follow these strict rules when extracting the details:"},
 
                 {"role": "user",
                  "content": f"""There is an email with the following content:
@@ -342,44 +900,65 @@ def extract_name_from_email(email_body, sender_name, sender_email):
                 {email_body}
                 ------------------------------
 
-                **Extraction Rules:**
-                1️⃣ **First, analyze the sender's name from the Google Account.** If it contains a **real person’s name or company name**, return it exactly as is.  
+                **"name" — the sender's name:**
+                1️⃣ **First, analyze the sender's name from the Google Account.** If it contains a **real person’s name or company name**, use it exactly as is.  
                 2️⃣ If the sender’s name is **nonsensical, random characters, an email address, or clearly not a human/company name**, ignore it.  
-                3️⃣ **Check the email body.** If the sender explicitly states their name (e.g., ‘Best regards, John Doe’), return only the name.  
+                3️⃣ **Check the email body.** If the sender explicitly states their name (e.g., ‘Best regards, John Doe’), use only the name.  
                 4️⃣ **Ignore the recipient’s name.** If the email starts with something like "Hi Julia", **Julia is NOT the sender's name.**  
-                5️⃣ **If the sender’s name is still unclear, look for a company name.** If a company is mentioned as the sender, return its name.  
-                6️⃣ **If no valid name is found, return `"Their"`**.  
+                5️⃣ **If the sender’s name is still unclear, look for a company name.** If a company is mentioned as the sender, use its name.  
+                6️⃣ If no valid name is found, use exactly: `"Their"`
+
+                **"phone" — the sender's phone number:**
+                1️⃣ Look for a phone number in the **email body**. It may appear in the signature or body content.
+                2️⃣ Prefer numbers that look like they are **mobile or personal contact numbers**, not generic support hotlines.
+                3️⃣ Accept international formats (e.g., +1 234-567-8901), local formats (e.g., (234) 567-8901), or plain (e.g., 2345678901).
+                4️⃣ If there are **multiple numbers**, use only the **first valid one** found.
+                5️⃣ If no phone number is found, use exactly: `"No phone"`
+
+                **"website" — the sender's company website:**
+                1️⃣ Look for a **valid website URL** in the email body (e.g., https://example.com or www.example.com).
+                2️⃣ If multiple websites are mentioned, use the **first one** that looks like the sender's/company's site.
+                3️⃣ If there is no website address in the text of the letter, but it can be taken from the sender - do it.
+                4️⃣ Ignore links to Gmail, LinkedIn, Facebook, Instagram, Twitter, and other social platforms unless clearly the main company site.
+                5️⃣ If no valid website is found, use exactly: `"No website"`
+
+                **"company" — the sender's company name:**
+                1️⃣ Try to find the company name in the **email body**, especially in the signature or footer.  
+                2️⃣ If the sender's name (from the Google Account) looks like a **company name**, use it.  
+                3️⃣ Do NOT confuse the recipient's company or referenced clients/partners with the sender’s company.  
+                4️⃣ If multiple companies are mentioned, choose the one clearly associated with the sender.  
+                5️⃣ If no valid company name is found, use exactly: `"No company"`
 
                 **Important Output Rules:**
-                - Respond with ONLY the extracted sender's name (without extra words like "The sender's name is...").  
-                - Do NOT add punctuation, quotes, or any explanation.  
-                - If you determine the name is invalid or missing, return exactly: `"Their"`  
+                - Respond with ONLY the JSON object, e.g. `{{"name": "John Doe", "phone": "+1 234-567-8901", "website": "https://example.com", "company": "Acme Corp"}}`
+                - Every value must be a plain string without extra words, labels or explanation
 
-                What is the sender's name according to these rules?"""
+                What are the sender's contact details according to these rules?"""
                  }
             ],
-            temperature=0
         )
 
-        name = response.choices[0].message.content.strip()
-        return name if name else "Their"
+        data = load_contact_json(content)
 
     except Exception as e:
-        print(f"⚠ Error while getting ChatGPT: {str(e)}")
-        return "Their"
+        logger.warning("⚠ Error while getting ChatGPT: %s", e)
+        data = {}
 
+    return validate_contact_info(data)
 
-def extract_website_from_email(email_body, sender_name, sender_email):
-    try:
-        client = OpenAI()
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
+def extract_company_name_from_email(email_body, sender_name, sender_email):
+    try:
+        content = request_completion(
+            PROMPT_VERSIONS["company"],
+            email_body,
+            sender_name,
+            sender_email,
             messages=[
                 {"role": "system",
-                 "content": "You are an advanced AI assistant that extracts the sender's company website from an email. "
-                            "Your response must contain ONLY the website URL and nothing else. "
-                            "Follow these strict rules when extracting the website:"},
+                 "content": "You are an advanced AI assistant that extracts the sender's company name from an email. "
+                            "Your response must contain ONLY the company name and nothing else. "
+                            "Follow these strict rules when extracting the company name:"},
 
                 {"role": "user",
                  "content": f"""There is an email with the following content:
@@ -392,42 +971,42 @@ def extract_website_from_email(email_body, sender_name, sender_email):
                 ------------------------------
 
                 **Extraction Rules:**
-                1️⃣ Look for a **valid website URL** in the email body (e.g., https://example.com or www.example.com).
-                2️⃣ If multiple websites are mentioned, return the **first one** that looks like the sender's/company's site.
-                3️⃣ If there is no website address in the text of the letter, but it can be taken from the sender - do it.
-                4️⃣ Ignore links to Gmail, LinkedIn, Facebook, Instagram, Twitter, and other social platforms unless clearly the main company site.
-                5️⃣ If no valid website is found, return exactly: `"No website"`
+                1️⃣ Try to find the company name in the **email body**, especially in the signature or footer.  
+                2️⃣ If the sender's name (from the Google Account) looks like a **company name**, use it.  
+                3️⃣ Do NOT confuse the recipient's company or referenced clients/partners with the sender’s company.  
+                4️⃣ If multiple companies are mentioned, choose the one clearly associated with the sender.  
+                5️⃣ If no valid company name is found, return exactly: `"No company"`
 
                 **Important Output Rules:**
-                - Respond with ONLY the website URL (e.g., `https://example.com`)
-                - Do NOT add quotes, labels, or explanation  
-                - If no valid website is found, return exactly: `"No website"`
+                - Respond with ONLY the company name (e.g., `Acme Corp`)  
+                - Do NOT add punctuation, quotes, or any explanation  
+                - If no valid company is found, return exactly: `"No company"`
 
-                What is the sender's company website according to these rules?"""
+                What is the sender's company name according to these rules?"""
                  }
             ],
-            temperature=0
         )
 
-        website = response.choices[0].message.content.strip()
-        return website if website else "No website"
+        company = content.strip()
+        return company if company else "No company"
 
     except Exception as e:
-        print(f"⚠ Error while getting ChatGPT: {str(e)}")
-        return "No website"
+        logger.warning("⚠ Error while getting ChatGPT: %s", e)
+        return "No company"
 
 
-def extract_phone_from_email(email_body, sender_name, sender_email):
+def extract_name_from_email(email_body, sender_name, sender_email):
     try:
-        client = OpenAI()
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
+        content = request_completion(
+            PROMPT_VERSIONS["name"],
+            email_body,
+            sender_name,
+            sender_email,
             messages=[
                 {"role": "system",
-                 "content": "You are an advanced AI assistant that extracts the sender's phone number from an email. "
-                            "Your response must contain ONLY the phone number and nothing else. "
-                            "Follow these strict rules when extracting the phone number:"},
+                 "content": "You are an advanced AI assistant that extracts the sender's name from an email. "
+                            "Your response must contain ONLY the sender's name and nothing else. "
+                            "Follow these strict rules when extracting the name:"},
 
                 {"role": "user",
                  "content": f"""There is an email with the following content:
@@ -440,29 +1019,29 @@ def extract_phone_from_email(email_body, sender_name, sender_email):
                 ------------------------------
 
                 **Extraction Rules:**
-                1️⃣ Look for a phone number in the **email body**. It may appear in the signature or body content.
-                2️⃣ Prefer numbers that look like they are **mobile or personal contact numbers**, not generic support hotlines.
-                3️⃣ Accept international formats (e.g., +1 234-567-8901), local formats (e.g., (234) 567-8901), or plain (e.g., 2345678901).
-                4️⃣ If there are **multiple numbers**, return only the **first valid one** found.
-                5️⃣ If no phone number is found, return exactly: `"No phone"`
+                1️⃣ **First, analyze the sender's name from the Google Account.** If it contains a **real person’s name or company name**, return it exactly as is.  
+                2️⃣ If the sender’s name is **nonsensical, random characters, an email address, or clearly not a human/company name**, ignore it.  
+                3️⃣ **Check the email body.** If the sender explicitly states their name (e.g., ‘Best regards, John Doe’), return only the name.  
+                4️⃣ **Ignore the recipient’s name.** If the email starts with something like "Hi Julia", **Julia is NOT the sender's name.**  
+                5️⃣ **If the sender’s name is still unclear, look for a company name.** If a company is mentioned as the sender, return its name.  
+                6️⃣ **If no valid name is found, return `"Their"`**.  
 
                 **Important Output Rules:**
-                - Respond with ONLY the phone number (e.g., `+1 234-567-8901`)  
-                - Do NOT add punctuation, quotes, labels, or any explanation.  
-                - If no valid number is found, return exactly: `"No phone"`
+                - Respond with ONLY the extracted sender's name (without extra words like "The sender's name is...").  
+                - Do NOT add punctuation, quotes, or any explanation.  
+                - If you determine the name is invalid or missing, return exactly: `"Their"`  
 
-                What is the sender's phone number according to these rules?"""
+                What is the sender's name according to these rules?"""
                  }
             ],
-            temperature=0
         )
 
-        phone = response.choices[0].message.content.strip()
-        return phone if phone else "No phone"
+        name = content.strip()
+        return name if name else "Their"
 
     except Exception as e:
-        print(f"⚠ Error while getting ChatGPT: {str(e)}")
-        return "No phone"
+        logger.warning("⚠ Error while getting ChatGPT: %s", e)
+        return "Their"
 
 
 FORM_URL_USER = "https://docs.google.com/forms/u/0/d/e/1FAIpQLScO2cwZOFXMC_sDW9KpiIq6uRu0J7J09AcmWYULq9YrMt9APQ/formResponse"
@@ -490,7 +1069,9 @@ FORM_FIELDS_AUTO = {
 }
 
 
-def send_to_google_forms(sent_at, sender_name, sender_email, content, domain='', company_name='', tel='', auto_gen=True):
+def send_to_google_forms(sent_at, sender_name, sender_email, content, domain='', company_name='', tel='', auto_gen=True,
+                         pending=None):
+    """Ставит ответ в очередь фоновой отправки в Google Forms"""
     if auto_gen is True:
         data = {
             FORM_FIELDS_AUTO["sent_at"]: sent_at,
@@ -501,7 +1082,7 @@ def send_to_google_forms(sent_at, sender_name, sender_email, content, domain='',
             FORM_FIELDS_AUTO["company_name"]: company_name,
             FORM_FIELDS_AUTO["tel"]: tel,
         }
-        response = requests.post(FORM_URL_AUTO, data=data)
+        forms_sink.submit(FORM_URL_AUTO, data, pending)
 
     elif auto_gen is False:
         data = {
@@ -513,12 +1094,7 @@ def send_to_google_forms(sent_at, sender_name, sender_email, content, domain='',
             FORM_FIELDS["company_name"]: company_name,
             FORM_FIELDS["tel"]: tel,
         }
-        response = requests.post(FORM_URL_USER, data=data)
-
-    if response.status_code == 200:
-        print("✅ Данные успешно отправлены в Google Sheets через Google Forms")
-    else:
-        print(f"⚠ Ошибка при отправке: {response.status_code}")
+        forms_sink.submit(FORM_URL_USER, data, pending)
 
 
 
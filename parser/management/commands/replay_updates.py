@@ -0,0 +1,104 @@
+import itertools
+import json
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from telebot import apihelper
+
+from parser.bot_instance import bot
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeTelegramSender:
+    """Подменяет Telegram Bot API: запоминает вызовы бота и отвечает правдоподобными объектами.
+
+    Устанавливается как apihelper.CUSTOM_REQUEST_SENDER, поэтому в Telegram ничего не уходит.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        api_method = url.rsplit("/", 1)[-1]
+        params = dict(params or {})
+        with self._lock:
+            self.calls.append((api_method, params))
+
+        if api_method in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return FakeResponse({"ok": True, "result": result})
+
+
+def load_updates(path):
+    """Читает обновления из JSON-массива или из файла с одним обновлением на строку"""
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+class Command(BaseCommand):
+    help = "Отправляет записанные обновления Telegram в webhook и показывает ответы бота"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSON-файл с обновлениями Telegram")
+        parser.add_argument(
+            "--live",
+            action="store_true",
+            help="Отправлять ответы бота в настоящий Telegram вместо подставного API",
+        )
+
+    def handle(self, *args, **options):
+        updates = load_updates(options["path"])
+        sender = None
+        if not options["live"]:
+            sender = FakeTelegramSender()
+            apihelper.CUSTOM_REQUEST_SENDER = sender
+
+        # Обработчики выполняются прямо в запросе, чтобы ответы шли в порядке обновлений
+        bot.threaded = False
+
+        client = Client(SERVER_NAME="localhost")
+        url = reverse("telegram_webhook")
+        # Webhook без секрета отклоняет запросы; для локального прогона подойдет временный
+        secret = settings.TELEGRAM_WEBHOOK_SECRET or secrets.token_hex(16)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+
+        with override_settings(TELEGRAM_WEBHOOK_SECRET=secret):
+            self.replay(client, url, headers, updates, sender)
+
+    def replay(self, client, url, headers, updates, sender):
+        for update in updates:
+            seen = len(sender.calls) if sender else 0
+            response = client.post(url, data=json.dumps(update), content_type="application/json", headers=headers)
+
+            text = (update.get("message") or {}).get("text", "")
+            self.stdout.write(f"➡ {update.get('update_id')} {text!r}: HTTP {response.status_code}")
+            if sender:
+                for api_method, params in sender.calls[seen:]:
+                    self.stdout.write(f"   ⬅ {api_method}: {params.get('text', '')!r}")
@@ -0,0 +1,171 @@
+"""Счетчики и гистограммы парсера в памяти процесса; отдаются в текстовом формате Prometheus"""
+import bisect
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+
+# Границы корзин гистограмм времени, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик, например число запросов к OpenAI"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Распределение длительностей по корзинам, плюс их сумма и количество"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # [счетчики корзин..., +Inf, сумма]
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет время блока with; время учитывается и при исключении"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_app(token=""):
+    """WSGI-приложение, которое отдает только render() по /metrics; с token требует Bearer-заголовок"""
+    def app(environ, start_response):
+        if environ.get("PATH_INFO") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b""]
+        if environ.get("REQUEST_METHOD") != "GET":
+            start_response("405 Method Not Allowed", [("Allow", "GET")])
+            return [b""]
+        received = environ.get("HTTP_AUTHORIZATION", "")
+        if token and not hmac.compare_digest(received.encode(), f"Bearer {token}".encode()):
+            start_response("403 Forbidden", [("Content-Type", "text/plain")])
+            return [b""]
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE)])
+        return [render().encode("utf-8")]
+    return app
+
+
+def serve(host, port, token=""):
+    """Отдает /metrics из фонового потока; остальные адреса Django здесь недоступны"""
+    server = make_server(host, port, make_app(token), handler_class=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+STAGE_SECONDS = Histogram("parser_stage_seconds", "Время обработки элемента на стадии конвейера", ("stage",))
+STAGE_ERRORS = Counter("parser_stage_errors_total", "Исключения в обработчиках стадий конвейера", ("stage",))
+OPERATION_SECONDS = Histogram(
+    "parser_operation_seconds", "Время отдельных операций: разбор MIME, декодирование тела", ("operation",)
+)
+IMAP_FETCH_SECONDS = Histogram("parser_imap_fetch_seconds", "Время одной команды UID FETCH", ("query",))
+IMAP_FETCHED_BYTES = Counter("parser_imap_fetched_bytes_total", "Байт получено командами UID FETCH", ("query",))
+LLM_REQUEST_SECONDS = Histogram("parser_llm_request_seconds", "Время одного запроса к OpenAI", ("prompt",))
+LLM_REQUESTS = Counter("parser_llm_requests_total", "Запросы к OpenAI по результату", ("prompt", "status"))
+SINK_POST_SECONDS = Histogram("parser_sink_post_seconds", "Время одной отправки ответа в Google Forms", ("status",))
+EMAILS = Counter("parser_emails_total", "Обработанные письма по типу", ("kind",))
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0002_autonews_sent_at_usernews_sent_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=255)),
+                ('mailbox', models.CharField(default='INBOX', max_length=255)),
+                ('uid_validity', models.BigIntegerField()),
+                ('last_uid', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('account', 'mailbox'), name='unique_mailbox_sync_state')],
+            },
+        ),
+    ]
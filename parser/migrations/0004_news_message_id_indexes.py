@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0003_mailboxsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autonews',
+            name='message_id',
+            field=models.CharField(blank=True, max_length=998, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='usernews',
+            name='company_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='usernews',
+            name='domain',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='usernews',
+            name='message_id',
+            field=models.CharField(blank=True, max_length=998, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='usernews',
+            name='tel',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='autonews',
+            name='sender_email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='autonews',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='usernews',
+            name='sender_email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='usernews',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0004_news_message_id_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(max_length=255)),
+                ('mailbox', models.CharField(default='INBOX', max_length=255)),
+                ('uid_validity', models.BigIntegerField()),
+                ('chat_id', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('done', 'Done')], db_index=True, default='active', max_length=16)),
+                ('last_emails', models.JSONField(default=dict)),
+                ('max_uid', models.BigIntegerField(default=0)),
+                ('processed_uids', models.TextField(blank=True, default='')),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('auto_mails', models.PositiveIntegerField(default=0)),
+                ('user_mails', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
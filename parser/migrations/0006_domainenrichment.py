@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0005_parsingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DomainEnrichment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True)),
+                ('company', models.CharField(blank=True, default='', max_length=255)),
+                ('website', models.CharField(blank=True, default='', max_length=255)),
+                ('confidence', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
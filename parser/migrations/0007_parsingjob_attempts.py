@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0006_domainenrichment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsingjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='parsingjob',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='active', max_length=16),
+        ),
+    ]
@@ -2,9 +2,10 @@ from django.db import models
 
 class AutoNews(models.Model):
     sender_name = models.CharField(max_length=255)
-    sender_email = models.EmailField()
+    sender_email = models.EmailField(db_index=True)
     content = models.TextField()
-    sent_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    message_id = models.CharField(max_length=998, unique=True, null=True, blank=True)
 
     def __str__(self):
         return f"{self.sent_at} ({self.sender_name})"
@@ -13,10 +14,66 @@ class AutoNews(models.Model):
 
 class UserNews(models.Model):
     sender_name = models.CharField(max_length=255)
-    sender_email = models.EmailField()
+    sender_email = models.EmailField(db_index=True)
     content = models.TextField()
-    sent_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    message_id = models.CharField(max_length=998, unique=True, null=True, blank=True)
+    domain = models.CharField(max_length=255, blank=True, default="")
+    company_name = models.CharField(max_length=255, blank=True, default="")
+    tel = models.CharField(max_length=64, blank=True, default="")
 
     def __str__(self):
         return f"{self.sent_at} ({self.sender_name})"
 
+
+class MailboxSyncState(models.Model):
+    account = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255, default="INBOX")
+    uid_validity = models.BigIntegerField()
+    last_uid = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["account", "mailbox"], name="unique_mailbox_sync_state"),
+        ]
+
+    def __str__(self):
+        return f"{self.account}/{self.mailbox} (UID {self.last_uid})"
+
+
+class ParsingJob(models.Model):
+    ACTIVE = "active"
+    DONE = "done"
+    FAILED = "failed"  # Задача не завершилась за JOB_MAX_ATTEMPTS запусков; ящик разбирается заново
+    STATUS_CHOICES = [(ACTIVE, "Active"), (DONE, "Done"), (FAILED, "Failed")]
+
+    account = models.CharField(max_length=255)
+    mailbox = models.CharField(max_length=255, default="INBOX")
+    uid_validity = models.BigIntegerField()
+    chat_id = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=ACTIVE, db_index=True)
+    last_emails = models.JSONField(default=dict)  # Отправитель -> UID его последнего письма
+    max_uid = models.BigIntegerField(default=0)
+    processed_uids = models.TextField(blank=True, default="")  # IMAP message set вида 1:500,502
+    processed = models.PositiveIntegerField(default=0)
+    auto_mails = models.PositiveIntegerField(default=0)
+    user_mails = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)  # Сколько раз задача запускалась
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.account}/{self.mailbox} {self.status} ({self.processed}/{len(self.last_emails)})"
+
+
+class DomainEnrichment(models.Model):
+    domain = models.CharField(max_length=255, unique=True)
+    company = models.CharField(max_length=255, blank=True, default="")
+    website = models.CharField(max_length=255, blank=True, default="")
+    confidence = models.FloatField(default=0.0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.domain} → {self.company or '—'} ({self.website or '—'})"
@@ -0,0 +1,149 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+from parser.metrics import STAGE_ERRORS, STAGE_SECONDS
+
+
+PIPELINE_QUEUE_SIZE = 100  # Размер очереди перед каждой стадией
+BATCH_WAIT = 1.0  # Сколько ждать добора пачки, прежде чем обработать неполную
+LATENCY_SAMPLES = 10000  # Сколько последних замеров времени хранить на стадию
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """Стадия конвейера: обработчик и число потоков, которые берут задачи из ее очереди.
+
+    Обработчик получает элемент (или список, если задан batch_size) и возвращает
+    результат для следующей стадии; None означает, что элемент дальше не идет.
+    Пакетный обработчик возвращает список результатов.
+    """
+
+    def __init__(self, name, handler, workers=1, batch_size=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.processed = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        """Перцентили времени обработки в секундах по последним замерам: {50: ..., 90: ..., 99: ...}"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return {}
+        return {
+            percentile: samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+            for percentile in percentiles
+        }
+
+
+class Pipeline:
+    """Стадии, связанные ограниченными очередями.
+
+    Когда медленная стадия не успевает, ее очередь заполняется, и put() предыдущей
+    стадии блокируется — так нагрузка выравнивается по самому узкому месту.
+    """
+
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        self.stages = stages
+        self._by_name = {stage.name: index for index, stage in enumerate(stages)}
+        for stage in stages:
+            stage.queue = queue.Queue(maxsize=queue_size)
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for worker_index in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_batches if stage.batch_size else self._run,
+                    args=(index,),
+                    name=f"{stage.name}-{worker_index}",
+                    daemon=True,
+                )
+                thread.start()
+                stage._threads.append(thread)
+        return self
+
+    def put(self, item, stage=None):
+        """Отдает элемент первой (или указанной) стадии; блокирует, если ее очередь заполнена"""
+        index = self._by_name[stage] if stage else 0
+        self.stages[index].queue.put(item)
+
+    def _forward(self, index, result):
+        if result is not None and index + 1 < len(self.stages):
+            self.stages[index + 1].queue.put(result)
+
+    def _handle(self, index, payload):
+        stage = self.stages[index]
+        started = time.perf_counter()
+        try:
+            result = stage.handler(payload)
+        except Exception as e:
+            with stage._lock:
+                stage.errors += 1
+            STAGE_ERRORS.inc(stage=stage.name)
+            logger.warning("⚠ Ошибка на стадии %s: %s", stage.name, e)
+            return None
+
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage.name)
+        with stage._lock:
+            stage.processed += len(payload) if stage.batch_size else 1
+            stage.latencies.append(elapsed)
+        return result
+
+    def _run(self, index):
+        stage = self.stages[index]
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            self._forward(index, self._handle(index, item))
+
+    def _run_batches(self, index):
+        stage = self.stages[index]
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            try:
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                item = stage.queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    if not batch:
+                        deadline = time.monotonic() + BATCH_WAIT
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            # Неполная пачка обрабатывается, если она ждет дольше BATCH_WAIT
+            if batch and (stopping or len(batch) >= stage.batch_size or time.monotonic() >= deadline):
+                for result in self._handle(index, batch) or []:
+                    self._forward(index, result)
+                batch = []
+
+    def close(self):
+        """Дожидается, пока все стадии по очереди обработают поступившие элементы"""
+        for stage in self.stages:
+            for _ in stage._threads:
+                stage.queue.put(_STOP)
+            for thread in stage._threads:
+                thread.join()
+
+    def queue_depths(self):
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def describe_queues(self):
+        return " ".join(f"{name}={depth}" for name, depth in self.queue_depths().items())
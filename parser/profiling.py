@@ -0,0 +1,112 @@
+"""Профилирование одной задачи парсинга: выборка стеков всех потоков или cProfile потока задачи"""
+import collections
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+SAMPLING = "sampling"  # Стеки всех потоков раз в SAMPLE_INTERVAL: видно стадии конвейера и загрузку IMAP
+CPROFILE = "cprofile"  # Точные вызовы, но только в потоке, где запущена задача
+PROFILE_MODES = (SAMPLING, CPROFILE)
+SAMPLE_INTERVAL = 0.005  # Секунды между снимками стеков
+PROFILE_TOP = 25  # Сколько функций показать в логе
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Раз в interval секунд снимает стеки всех потоков процесса.
+
+    Результат пишется в формате collapsed stacks ("f1;f2;f3 число"), который
+    открывают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit=PROFILE_TOP):
+        """Функции, в которых потоки находились чаще всего (собственное время)"""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_job(name, directory, mode=SAMPLING):
+    """Профилирует блок with и сохраняет профиль в directory.
+
+    Если directory пустой, профилирование выключено и блок выполняется как есть.
+    Возвращает путь к файлу профиля (или None).
+    """
+    if not directory:
+        yield None
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Неизвестный режим профилирования: {mode}")
+
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if mode == CPROFILE:
+        path = base + ".prof"
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            logger.info("🔬 Профиль %s сохранен в %s\n%s", name, path, stream.getvalue())
+        return
+
+    path = base + ".folded"
+    profiler = SamplingProfiler().start()
+    try:
+        yield path
+    finally:
+        profiler.stop()
+        profiler.write(path)
+        top = "\n".join(f"  {count:>7}  {function}" for function, count in profiler.top())
+        logger.info("🔬 Профиль %s сохранен в %s (%s снимков)\n%s", name, path, profiler.samples, top)
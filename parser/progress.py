@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+
+PROGRESS_INTERVAL = 3.0  # Не чаще одного редактирования сообщения за столько секунд
+PROGRESS_RETRY_AFTER = 5.0  # Пауза после 429, если Telegram не прислал retry_after
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} ч {seconds % 3600 // 60} мин"
+    if seconds >= 60:
+        return f"{seconds // 60} мин {seconds % 60} с"
+    return f"{seconds} с"
+
+
+class ProgressReporter:
+    """Показывает прогресс парсинга в одном сообщении Telegram, которое редактируется в отдельном потоке.
+
+    update() только запоминает последние значения и сразу возвращается, поэтому
+    обработка писем никогда не ждет Telegram. Поток отправляет самое свежее
+    состояние не чаще раза в interval секунд, промежуточные обновления пропускаются.
+    """
+
+    def __init__(self, bot, chat_id, total, processed=0, interval=PROGRESS_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.total = total
+        self.interval = interval
+        self._processed = processed
+        self._initial = processed
+        self._started_at = time.monotonic()
+        self._message_id = None
+        self._last_text = None
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"progress-{chat_id}", daemon=True)
+
+    def start(self):
+        self._changed.set()
+        self._thread.start()
+        return self
+
+    def update(self, processed):
+        with self._lock:
+            self._processed = processed
+        self._changed.set()
+
+    def render(self):
+        with self._lock:
+            processed = self._processed
+
+        percent = int(processed / self.total * 100) if self.total else 100
+        lines = [f"📊 Выполнено: {percent}% ({processed}/{self.total})"]
+
+        elapsed = time.monotonic() - self._started_at
+        done = processed - self._initial
+        if done > 0 and elapsed > 0:
+            rate = done / elapsed
+            lines.append(f"⚡ Скорость: {rate:.1f} писем/с")
+            if processed < self.total:
+                lines.append(f"⏱ Осталось: ~{format_duration((self.total - processed) / rate)}")
+        return "\n".join(lines)
+
+    def _send(self, text):
+        if text == self._last_text:
+            return
+
+        try:
+            if self._message_id is None:
+                self._message_id = self.bot.send_message(self.chat_id, text).message_id
+            else:
+                self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self._message_id)
+            self._last_text = text
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                # Flood limit: ждем, сколько просит Telegram, и отправляем уже свежее состояние
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", PROGRESS_RETRY_AFTER)
+                self._stopped.wait(retry_after)
+                self._changed.set()
+            elif "message is not modified" not in e.description:
+                logger.warning("⚠ Ошибка обновления прогресса: %s", e.description)
+        except Exception as e:
+            logger.warning("⚠ Ошибка обновления прогресса: %s", e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._changed.wait()
+            if self._stopped.is_set():
+                break
+
+            self._changed.clear()
+            self._send(self.render())
+            self._stopped.wait(self.interval)
+
+    def close(self):
+        """Останавливает поток и показывает итоговое состояние"""
+        self._stopped.set()
+        self._changed.set()
+        self._thread.join()
+        self._send(self.render())
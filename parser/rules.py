@@ -0,0 +1,158 @@
+"""Правила распознавания автоматических писем.
+
+Правило — словарь с полями:
+    name    — имя, которое сообщается при срабатывании;
+    target  — где искать: "sender" (адрес отправителя), "body" (текст письма)
+              или "header" (значение заголовка из поля header);
+    phrases — список фраз, которые ищутся без учета регистра, или
+    pattern — регулярное выражение (тоже без учета регистра).
+
+Свои правила можно задать в настройках Django списком PARSER_CLASSIFICATION_RULES
+или JSON-файлом PARSER_CLASSIFICATION_RULES_FILE.
+"""
+import json
+import re
+
+from django.conf import settings
+
+
+DEFAULT_RULES = [
+    {"name": "noreply_sender", "target": "sender", "pattern": r"no-?reply"},
+    {"name": "unsubscribe", "target": "body", "phrases": ["unsubscribe"]},
+    {
+        "name": "automated_phrase",
+        "target": "body",
+        "phrases": [
+            "do not reply", "automated message", "click here",
+            "manage your preferences", "update your settings", "do not respond", "google",
+        ],
+    },
+    {"name": "html_markup", "target": "body", "pattern": r"<html>|<body>|<div>"},
+    {"name": "list_unsubscribe", "target": "header", "header": "List-Unsubscribe", "pattern": r"\S"},
+    {"name": "mailing_list", "target": "header", "header": "List-Id", "pattern": r"\S"},
+    {"name": "auto_submitted", "target": "header", "header": "Auto-Submitted", "pattern": r"auto-\w+"},
+    {"name": "bulk_precedence", "target": "header", "header": "Precedence", "pattern": r"bulk|list|junk"},
+    {"name": "auto_response", "target": "header", "header": "X-Auto-Response-Suppress", "pattern": r"\S"},
+    {
+        "name": "bulk_mailer",
+        "target": "header",
+        "header": "X-Mailer",
+        "phrases": [
+            "mailchimp", "sendgrid", "mailgun", "amazon ses", "hubspot", "salesforce", "phpmailer",
+            "sendinblue", "brevo", "mailjet", "constant contact", "campaign monitor", "klaviyo",
+        ],
+    },
+]
+
+PHRASE_GROUP = "phrase"
+
+
+def load_rules():
+    """Берет правила из настроек Django, а если их нет — правила по умолчанию"""
+    rules = getattr(settings, "PARSER_CLASSIFICATION_RULES", None)
+    rules_file = getattr(settings, "PARSER_CLASSIFICATION_RULES_FILE", None)
+
+    if rules is None and rules_file:
+        with open(rules_file, encoding="utf-8") as f:
+            rules = json.load(f)
+
+    return rules if rules is not None else DEFAULT_RULES
+
+
+def build_trie_pattern(phrases):
+    """Собирает фразы в регулярное выражение-дерево с общими префиксами.
+
+    Движок проверяет каждую позицию текста за один проход по дереву, поэтому
+    время поиска почти не растет с числом фраз.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+
+        pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+class RuleEngine:
+    """Правила, скомпилированные в одно регулярное выражение на каждый источник текста"""
+
+    def __init__(self, rules):
+        grouped = {}
+        self.header_names = []
+        for rule in rules:
+            target = rule["target"]
+            if target == "header":
+                target = f"header:{rule['header'].lower()}"
+                if rule["header"].lower() not in (name.lower() for name in self.header_names):
+                    self.header_names.append(rule["header"])
+            grouped.setdefault(target, []).append(rule)
+
+        self._compiled = {target: self._compile(target_rules) for target, target_rules in grouped.items()}
+
+    @staticmethod
+    def _compile(rules):
+        phrases = []
+        phrase_rules = {}
+        parts = []
+        group_rules = {}
+
+        for rule in rules:
+            for phrase in rule.get("phrases", []):
+                phrases.append(phrase.lower())
+                phrase_rules.setdefault(phrase.casefold(), rule["name"])
+            if rule.get("pattern"):
+                group = f"rule{len(group_rules)}"
+                group_rules[group] = rule["name"]
+                parts.append(f"(?P<{group}>{rule['pattern']})")
+
+        if phrase_rules:
+            parts.insert(0, f"(?P<{PHRASE_GROUP}>{build_trie_pattern(phrases)})")
+
+        return re.compile("|".join(parts), re.IGNORECASE), phrase_rules, group_rules
+
+    def match(self, target, text):
+        """Возвращает имя первого сработавшего правила для текста или None"""
+        compiled = self._compiled.get(target)
+        if compiled is None or not text:
+            return None
+
+        pattern, phrase_rules, group_rules = compiled
+        found = pattern.search(text)
+        if found is None:
+            return None
+
+        if phrase_rules and found.group(PHRASE_GROUP) is not None:
+            # IGNORECASE сравнивает символы иначе, чем lower(): "ſ" совпадает с "s", поэтому ищем по casefold,
+            # а если и так не нашлось — отдаем первое правило с фразами
+            phrase = found.group(PHRASE_GROUP).casefold()
+            return phrase_rules.get(phrase) or next(iter(phrase_rules.values()))
+        # Во вложенных выражениях правил могут быть свои группы, поэтому lastgroup не подходит
+        for group, name in group_rules.items():
+            if found.group(group) is not None:
+                return name
+        return None
+
+    def classify(self, sender_email, body):
+        """Проверяет отправителя и тело письма; возвращает имя сработавшего правила или None"""
+        return self.match("sender", sender_email) or self.match("body", body)
+
+    def classify_headers(self, headers, sender_email):
+        """Проверяет заголовки письма и отправителя, не глядя на тело"""
+        for name in self.header_names:
+            for value in headers.get_all(name) or []:
+                rule = self.match(f"header:{name.lower()}", str(value))
+                if rule:
+                    return rule
+        return self.match("sender", sender_email)
@@ -0,0 +1,238 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.db import transaction
+
+from parser.lazy import lazy_module
+from parser.metrics import SINK_POST_SECONDS
+from parser.models import AutoNews, UserNews
+
+
+FORMS_QUEUE_SIZE = 1000  # Сколько ответов может ждать отправки, прежде чем обработка притормозит
+FORMS_WORKERS = 2
+FORMS_TIMEOUT = 15
+FORMS_MAX_RETRIES = 4
+FORMS_BACKOFF = 1.0  # Базовая задержка между повторами, секунды
+DB_BATCH_SIZE = 500  # Сколько результатов копить перед записью в базу
+
+requests = lazy_module("requests")
+logger = logging.getLogger(__name__)
+
+
+class PendingSubmissions:
+    """Сколько ответов одной задачи еще ждут отправки в очереди FormsSink"""
+
+    def __init__(self):
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def add(self):
+        with self._condition:
+            self._count += 1
+
+    def done(self):
+        with self._condition:
+            self._count -= 1
+            if not self._count:
+                self._condition.notify_all()
+
+    def wait(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._count)
+
+
+class FormsSink:
+    """Отправляет ответы в Google Forms из фоновых потоков через общую keep-alive сессию"""
+
+    def __init__(self, workers=FORMS_WORKERS, max_queue=FORMS_QUEUE_SIZE, timeout=FORMS_TIMEOUT,
+                 max_retries=FORMS_MAX_RETRIES, backoff=FORMS_BACKOFF):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._session = None
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+
+            self._session = requests.get().Session()
+            adapter = requests.get().adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"forms-sink-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+            atexit.register(self.close)
+
+    def submit(self, url, data, pending=None):
+        """Ставит отправку в очередь. Если очередь заполнена, ждет свободного места.
+
+        Если передан pending (PendingSubmissions), отправка учитывается в нем до завершения.
+        """
+        self._start()
+        if pending is not None:
+            pending.add()
+        self._queue.put((url, data, pending))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                url, data, pending = item
+                try:
+                    self._post(url, data)
+                finally:
+                    if pending is not None:
+                        pending.done()
+            except Exception as e:
+                logger.warning("⚠ Ошибка при отправке: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _post(self, url, data):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            started = time.perf_counter()
+            try:
+                response = self._session.post(url, data=data, timeout=self.timeout)
+            except requests.get().RequestException as e:
+                SINK_POST_SECONDS.observe(time.perf_counter() - started, status="error")
+                error = str(e)
+                continue
+            SINK_POST_SECONDS.observe(time.perf_counter() - started, status=str(response.status_code))
+
+            if response.status_code == 200:
+                self.sent += 1
+                logger.debug("✅ Данные успешно отправлены в Google Sheets через Google Forms")
+                return
+
+            error = response.status_code
+            # Повторяем только временные ошибки сервера и превышение лимита
+            if response.status_code != 429 and response.status_code < 500:
+                break
+
+        self.failed += 1
+        logger.warning("⚠ Ошибка при отправке: %s", error)
+
+    def flush(self):
+        """Ждет, пока все поставленные в очередь ответы будут отправлены"""
+        self._queue.join()
+
+    def close(self):
+        """Отправляет остаток очереди и останавливает фоновые потоки"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class DatabaseSink:
+    """Копит результаты и записывает их в AutoNews/UserNews пачками через bulk_create"""
+
+    def __init__(self, batch_size=DB_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.saved = 0
+        self._buffers = {AutoNews: {}, UserNews: {}}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def submit(self, result):
+        model = AutoNews if result["auto_gen"] else UserNews
+        fields = {
+            "sender_name": result["sender_name"] or "",
+            "sender_email": result["sender_email"] or "",
+            "content": result["content"],
+            "sent_at": result["sent_at"],
+            "message_id": result.get("message_id") or None,
+        }
+        if model is UserNews:
+            fields.update(
+                domain=result.get("domain", ""),
+                company_name=result.get("company_name", ""),
+                tel=result.get("tel", ""),
+            )
+
+        batch = None
+        with self._lock:
+            buffer = self._buffers[model]
+            # Письмо с тем же Message-ID в одной пачке заменяет предыдущее
+            buffer[fields["message_id"] or object()] = model(**fields)
+            if len(buffer) >= self.batch_size:
+                batch = list(buffer.values())
+                buffer.clear()
+
+        if batch:
+            self._write(model, batch)
+
+    def _write(self, model, objects):
+        with_message_id = [obj for obj in objects if obj.message_id]
+        without_message_id = [obj for obj in objects if not obj.message_id]
+        update_fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key and field.name != "message_id"
+        ]
+
+        with self._write_lock, transaction.atomic():
+            if with_message_id:
+                # Повторный запуск обновляет уже сохраненные письма, а не дублирует их
+                model.objects.bulk_create(
+                    with_message_id,
+                    update_conflicts=True,
+                    unique_fields=["message_id"],
+                    update_fields=update_fields,
+                )
+            if without_message_id:
+                model.objects.bulk_create(without_message_id)
+
+        self.saved += len(objects)
+
+    def flush(self):
+        """Записывает все накопленные результаты"""
+        with self._lock:
+            batches = [(model, list(buffer.values())) for model, buffer in self._buffers.items() if buffer]
+            for buffer in self._buffers.values():
+                buffer.clear()
+
+        for model, objects in batches:
+            self._write(model, objects)
+
+
+class JobOutput:
+    """Результаты одной задачи парсинга: свой буфер DatabaseSink и учет ее ответов в общем FormsSink.
+
+    flush() дожидается только отправок этой задачи, поэтому контрольная точка
+    одной задачи не ждет, пока уйдут ответы других задач.
+    """
+
+    def __init__(self):
+        self.database = DatabaseSink()
+        self.pending = PendingSubmissions()
+
+    def flush(self):
+        self.pending.wait()
+        self.database.flush()
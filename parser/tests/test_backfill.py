@@ -0,0 +1,40 @@
+from email.mime.text import MIMEText
+from unittest import mock
+
+import spacy
+from django.test import SimpleTestCase
+
+from parser.lazy import LazyLoader
+from parser.management.commands import parser_emails as pe
+
+
+def message(sender, body, **headers):
+    msg = MIMEText(body, "plain", "utf-8")
+    msg["From"] = sender
+    msg["Subject"] = "Hello"
+    msg["Date"] = "Mon, 01 Jan 2024 10:00:00 +0000"
+    for name, value in headers.items():
+        msg[name.replace("_", "-")] = value
+    return msg.as_bytes()
+
+
+class PrepareRawEmailsTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pe, "nlp", LazyLoader(lambda: spacy.blank("en")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runs_spacy_for_user_mail_in_the_batch(self):
+        results = pe.prepare_raw_emails([
+            message("John Doe <john@acme.example>", "Hi Anna,\n\nCall me at +1 234-567-8901.\n\nBest,\nJohn"),
+            message("News <noreply@shop.example>", "Weekly offers"),
+            b"not an email",
+        ])
+
+        user, auto, skipped = results
+        self.assertFalse(user["auto_gen"])
+        self.assertEqual(user["local_contact"]["phone"][0], "+1 234-567-8901")
+        self.assertIn("text", user)
+        self.assertEqual(auto["rule"], "noreply_sender")
+        self.assertNotIn("local_contact", auto)
+        self.assertIsNone(skipped)
@@ -0,0 +1,160 @@
+import base64
+import email
+import quopri
+
+from django.test import SimpleTestCase
+
+from parser.bodystructure import find_text_part, iter_fetch_items, parse_sexp
+from parser.imap_pool import build_message_set, build_text_message, expand_message_set, iter_fetch_responses, trim_encoded
+
+# Ответы imaplib на UID FETCH в том виде, в каком их присылает imap.gmail.com (адреса и тексты заменены)
+ALTERNATIVE = [
+    b'1 (UID 101 BODYSTRUCTURE (("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 1234 30 NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 5678 100 NIL NIL NIL)'
+    b' "ALTERNATIVE" ("BOUNDARY" "000000000000a1b2c3") NIL NIL))',
+]
+MIXED_WITH_ATTACHMENT = [
+    b'2 (UID 102 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 42 2 NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "7BIT" 120 3 NIL NIL NIL) "ALTERNATIVE"'
+    b' ("BOUNDARY" "000000000000d4e5f6") NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "invoice.pdf") "<f_1>" NIL "BASE64" 81234 NIL'
+    b' ("ATTACHMENT" ("FILENAME" "invoice.pdf")) NIL) "MIXED" ("BOUNDARY" "000000000000g7h8i9") NIL NIL))',
+]
+TEXT_ATTACHMENT_FIRST = [
+    b'3 (UID 103 BODYSTRUCTURE (("TEXT" "PLAIN" ("CHARSET" "US-ASCII" "NAME" "notes.txt") NIL NIL "BASE64" 300 4 NIL'
+    b' ("ATTACHMENT" ("FILENAME" "notes.txt")) NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "windows-1251") NIL NIL "BASE64" 900 12 NIL NIL NIL)'
+    b' "MIXED" ("BOUNDARY" "xyz") NIL NIL))',
+]
+# Имя файла с кавычками Gmail присылает литералом прямо внутри BODYSTRUCTURE
+LITERAL_IN_STRUCTURE = [
+    (b'4 (UID 104 BODYSTRUCTURE (("TEXT" "PLAIN" ("CHARSET" "UTF-8" "NAME" {9}', b'a "b".txt'),
+    b') NIL NIL "BASE64" 100 2 NIL NIL NIL)("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "BASE64" 200 4 NIL NIL NIL)'
+    b' "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL))',
+]
+MESSAGE_RFC822 = [
+    b'5 (UID 105 BODYSTRUCTURE (("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 ("Mon, 1 Jan 2024 10:00:00 +0000"'
+    b' "Fwd" NIL NIL NIL NIL NIL NIL NIL "<fwd@x>") ("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 20 1'
+    b' NIL NIL NIL) 10 NIL NIL NIL)("IMAGE" "PNG" ("NAME" "a.png") NIL NIL "BASE64" 100 NIL NIL NIL)'
+    b' "MIXED" ("BOUNDARY" "b2") NIL NIL))',
+]
+# Ответ на запрос заголовков и текстовой части: UID приходит после литералов
+TEXT_PARTS = [
+    (b'6 (BODY[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)] {43}', b'Subject: Hello\r\nFrom: anna@shop.example\r\n\r\n'),
+    (b' BODY[1]<0> {12}', b'Hello, world'),
+    b' UID 106)',
+    (b'7 (UID 107 BODY[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)] {19}', b'Subject: Second\r\n\r\n'),
+    (b' BODY[1]<0> {0}', b''),
+    b')',
+]
+
+
+def structure(msg_data):
+    return next(iter_fetch_items(msg_data))["BODYSTRUCTURE"]
+
+
+class ParseSexpTests(SimpleTestCase):
+    def test_parses_atoms_strings_and_nil(self):
+        self.assertEqual(
+            parse_sexp(b'(UID 5 FLAGS (\\Seen) X NIL "quoted \\"str\\"")'),
+            [["UID", "5", "FLAGS", ["\\Seen"], "X", None, 'quoted "str"']],
+        )
+
+    def test_section_atom_keeps_brackets(self):
+        self.assertEqual(
+            parse_sexp(b"(BODY[HEADER.FIELDS (FROM DATE)]<0> NIL)"),
+            [["BODY[HEADER.FIELDS (FROM DATE)]<0>", None]],
+        )
+
+    def test_literal_is_bytes(self):
+        self.assertEqual(parse_sexp(b"(BODY[1] {5}\r\nA (b)\r\n UID 3)"), [["BODY[1]", b"A (b)", "UID", "3"]])
+
+    def test_unbalanced_input_is_closed(self):
+        self.assertEqual(parse_sexp(b"(A (B"), [["A", ["B"]]])
+
+
+class IterFetchItemsTests(SimpleTestCase):
+    def test_uid_after_literals(self):
+        items = list(iter_fetch_items(TEXT_PARTS))
+
+        self.assertEqual([item["UID"] for item in items], ["106", "107"])
+        self.assertEqual(items[0]["BODY[1]<0>"], b"Hello, world")
+        self.assertTrue(items[0]["BODY[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)]"].startswith(b"Subject: Hello"))
+        self.assertEqual(items[1]["BODY[1]<0>"], b"")
+
+    def test_literal_inside_bodystructure(self):
+        item = next(iter_fetch_items(LITERAL_IN_STRUCTURE))
+
+        self.assertEqual(item["UID"], "104")
+        self.assertEqual(item["BODYSTRUCTURE"][0][2], ["CHARSET", "UTF-8", "NAME", b'a "b".txt'])
+
+    def test_several_messages_in_one_response(self):
+        items = list(iter_fetch_items(ALTERNATIVE + MIXED_WITH_ATTACHMENT + [b"A0001 OK Success"]))
+        self.assertEqual([item.get("UID") for item in items[:2]], ["101", "102"])
+
+    def test_iter_fetch_responses_finds_uid_after_literal(self):
+        msg_data = [(b"1 (RFC822 {5}", b"Hello"), b" UID 7)", (b"2 (UID 8 RFC822 {3}", b"Bye"), b")"]
+        self.assertEqual(list(iter_fetch_responses(msg_data)), [(b"7", b"Hello"), (b"8", b"Bye")])
+
+
+class FindTextPartTests(SimpleTestCase):
+    def test_multipart_alternative_takes_plain(self):
+        self.assertEqual(find_text_part(structure(ALTERNATIVE)), {
+            "section": "1", "content_type": "text/plain", "charset": "UTF-8",
+            "encoding": "quoted-printable", "size": 1234,
+        })
+
+    def test_nested_section(self):
+        part = find_text_part(structure(MIXED_WITH_ATTACHMENT))
+        self.assertEqual((part["section"], part["content_type"], part["encoding"]), ("1.1", "text/plain", "7bit"))
+
+    def test_skips_text_attachment(self):
+        part = find_text_part(structure(TEXT_ATTACHMENT_FIRST))
+        self.assertEqual((part["section"], part["content_type"], part["charset"]), ("2", "text/html", "windows-1251"))
+
+    def test_literal_parameter(self):
+        part = find_text_part(structure(LITERAL_IN_STRUCTURE))
+        self.assertEqual((part["section"], part["encoding"]), ("1", "base64"))
+
+    def test_does_not_descend_into_attached_message(self):
+        self.assertIsNone(find_text_part(structure(MESSAGE_RFC822)))
+
+    def test_single_part_message(self):
+        single = parse_sexp(b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 5 1 NIL NIL NIL)')[0]
+        self.assertEqual(find_text_part(single)["section"], "1")
+
+
+class MessageSetTests(SimpleTestCase):
+    def test_compresses_ranges(self):
+        uids = [b"10", b"1", b"2", b"3", b"5", b"7", b"8", b"3"]
+        self.assertEqual(build_message_set(uids), "1:3,5,7:8,10")
+        self.assertEqual(expand_message_set(build_message_set(uids)), [1, 2, 3, 5, 7, 8, 10])
+
+    def test_single_uid(self):
+        self.assertEqual(build_message_set(["42"]), "42")
+
+
+class TrimEncodedTests(SimpleTestCase):
+    def test_base64_cut_mid_quantum(self):
+        encoded = base64.encodebytes("Привет, мир! Hello, world!".encode())
+        for cut in range(1, len(encoded)):
+            with self.subTest(cut=cut):
+                # Обрезанный хвост должен декодироваться без ошибок
+                base64.b64decode(trim_encoded(encoded[:cut], "base64"), validate=True)
+
+    def test_quoted_printable_cut_mid_escape(self):
+        self.assertEqual(trim_encoded(b"Caf=C3=A", "quoted-printable"), b"Caf=C3")
+        self.assertEqual(trim_encoded(b"Caf=", "quoted-printable"), b"Caf")
+        self.assertEqual(trim_encoded(b"Caf=C3=A9", "quoted-printable"), b"Caf=C3=A9")
+
+    def test_plain_encodings_are_untouched(self):
+        self.assertEqual(trim_encoded(b"abc=", "7bit"), b"abc=")
+
+    def test_truncated_part_builds_readable_message(self):
+        part = find_text_part(structure(ALTERNATIVE))
+        body = trim_encoded(quopri.encodestring("Café ".encode() * 50)[:101], part["encoding"])
+        raw = build_text_message(b"Subject: Hi\r\n", part, body)
+
+        message = email.message_from_bytes(raw)
+        self.assertEqual(message["Subject"], "Hi")
+        self.assertTrue(message.get_payload(decode=True).decode("utf-8", errors="ignore").startswith("Café Café"))
@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from parser import decoding
+from parser.decoding import decode_payload, normalize_charset
+
+
+class NormalizeCharsetTests(SimpleTestCase):
+    def test_aliases_and_quotes(self):
+        self.assertEqual(normalize_charset('"UTF-8"'), "utf-8")
+        self.assertEqual(normalize_charset("GB2312"), "gb18030")
+        self.assertEqual(normalize_charset("ks_c_5601-1987"), "cp949")
+
+    def test_unknown_charset(self):
+        self.assertIsNone(normalize_charset("x-unknown-charset"))
+        self.assertIsNone(normalize_charset(None))
+
+
+class DecodePayloadTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(decoding, "chardet")
+        self.chardet = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_declared_charset(self):
+        self.assertEqual(decode_payload("Привет".encode("koi8-r"), "koi8-r"), "Привет")
+        self.chardet.get.assert_not_called()
+
+    def test_wrong_declared_charset_falls_back_to_utf8(self):
+        self.assertEqual(decode_payload("Привет".encode(), "us-ascii"), "Привет")
+        self.chardet.get.assert_not_called()
+
+    def test_chardet_only_when_nothing_fits(self):
+        self.chardet.get.return_value.detect.return_value = {"encoding": "windows-1251"}
+        payload = "Привет, мир".encode("cp1251")
+
+        self.assertEqual(decode_payload(payload), "Привет, мир")
+        sample = self.chardet.get.return_value.detect.call_args.args[0]
+        self.assertEqual(sample, payload[:decoding.DETECT_SAMPLE_BYTES])
+
+    def test_truncated_multibyte_character_is_dropped(self):
+        payload = "Привет".encode()[:-1]
+        self.assertEqual(decode_payload(payload, "utf-8"), "Приве")
+        self.chardet.get.assert_not_called()
+
+    def test_empty_payload(self):
+        self.assertEqual(decode_payload(b""), "")
+        self.assertEqual(decode_payload(None), "")
@@ -0,0 +1,54 @@
+from django.test import TestCase
+
+from parser.domain_cache import DomainEnrichmentCache, enrichment_domain, matches_domain
+from parser.models import DomainEnrichment
+
+
+class EnrichmentDomainTests(TestCase):
+    def test_public_mailboxes_are_not_cached(self):
+        for sender in ("bob@comcast.net", "ann@yahoo.co.uk", "li@qq.com", "max@web.de", "joe@msn.com"):
+            with self.subTest(sender=sender):
+                self.assertEqual(enrichment_domain(sender), "")
+
+    def test_company_domain(self):
+        self.assertEqual(enrichment_domain("John@Acme-Corp.co.uk"), "acme-corp.co.uk")
+
+
+class MatchesDomainTests(TestCase):
+    def test_website(self):
+        self.assertTrue(matches_domain("acme.com", "website", "https://www.acme.com/contact"))
+        self.assertTrue(matches_domain("mail.acme.com", "website", "acme.com"))
+        self.assertTrue(matches_domain("acme.com", "website", "https://shop.acme.com"))
+        self.assertFalse(matches_domain("acme.com", "website", "https://smith-plumbing.example"))
+        self.assertFalse(matches_domain("acme.com", "website", "https://notacme.com"))
+
+    def test_company(self):
+        self.assertTrue(matches_domain("acme-corp.co.uk", "company", "Acme Corp Ltd"))
+        self.assertTrue(matches_domain("acme.com", "company", "ACME Inc."))
+        self.assertFalse(matches_domain("acme.com", "company", "Smith Plumbing"))
+        self.assertFalse(matches_domain("co.uk", "company", "Co Op"))
+
+
+class DomainEnrichmentCacheTests(TestCase):
+    def setUp(self):
+        self.cache = DomainEnrichmentCache()
+
+    def test_values_from_another_company_are_not_remembered(self):
+        # Подрядчик пишет с домена провайдера, которого нет в списке публичной почты
+        self.cache.remember("smalltown-isp.net", "Smith Plumbing", "https://smith-plumbing.example", 0.9)
+
+        self.assertIsNone(self.cache.get("smalltown-isp.net"))
+        self.assertFalse(DomainEnrichment.objects.exists())
+
+    def test_only_matching_field_is_remembered(self):
+        self.cache.remember("acme.com", "Smith Plumbing", "https://www.acme.com", 0.9)
+
+        self.assertEqual(self.cache.get("acme.com"), {"company": "", "website": "https://www.acme.com"})
+
+    def test_matching_values_are_remembered(self):
+        self.cache.remember("acme-corp.co.uk", "Acme Corp Ltd", "https://acme-corp.co.uk", 0.9)
+
+        self.assertEqual(
+            DomainEnrichmentCache().get("acme-corp.co.uk"),
+            {"company": "Acme Corp Ltd", "website": "https://acme-corp.co.uk"},
+        )
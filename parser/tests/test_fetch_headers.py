@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+
+from parser.management.commands import parser_emails as pe
+
+
+def header_response(index, uid, sender):
+    headers = f"From: {sender}\r\nMessage-ID: <{uid}@x>\r\n\r\n".encode()
+    return (f"{index} (UID {uid} RFC822.SIZE 100 BODY[HEADER.FIELDS (FROM MESSAGE-ID)] {{{len(headers)}}}".encode(), headers)
+
+
+class FakeMail:
+    """Отвечает на UID FETCH заранее заданными ответами"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.commands = []
+
+    def uid(self, command, message_set, query):
+        self.commands.append(message_set)
+        return self.responses.pop(0)
+
+
+class FetchHeadersTests(SimpleTestCase):
+    def test_partial_answer_with_no_raises(self):
+        # Gmail: "NO Some messages could not be FETCHed" вместе с частью ответов
+        mail = FakeMail(("NO", [header_response(1, 1, "a@x.example"), b")"]))
+
+        with self.assertRaises(RuntimeError):
+            pe.fetch_headers(mail, [b"1", b"2"])
+
+    def test_no_without_missing_messages_is_accepted(self):
+        mail = FakeMail(("NO", [header_response(1, 1, "a@x.example"), b")"]))
+        sizes = {}
+
+        headers = pe.fetch_headers(mail, [b"1"], sizes=sizes)
+
+        self.assertEqual(headers[b"1"]["From"], "a@x.example")
+        self.assertEqual(sizes, {b"1": 100})
+
+    def test_missing_message_in_ok_answer_was_expunged(self):
+        mail = FakeMail(("OK", [header_response(1, 1, "a@x.example"), b")"]))
+        self.assertEqual(list(pe.fetch_headers(mail, [b"1", b"2"])), [b"1"])
+
+    def test_batches(self):
+        mail = FakeMail(
+            ("OK", [header_response(1, 1, "a@x.example"), b")", header_response(2, 2, "b@x.example"), b")"]),
+            ("OK", [header_response(3, 3, "c@x.example"), b")"]),
+        )
+
+        headers = pe.fetch_headers(mail, [b"1", b"2", b"3"], batch_size=2)
+
+        self.assertEqual(mail.commands, ["1:2", "3"])
+        self.assertEqual(sorted(headers), [b"1", b"2", b"3"])
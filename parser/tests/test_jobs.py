@@ -0,0 +1,126 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from parser.jobs import CANCELLED, DONE, FAILED, QUEUED, JobManager
+
+TIMEOUT = 5
+
+
+class JobManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.started = []
+        self.finished = threading.Semaphore(0)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def blocking(self, job, name):
+        # Задача ждет разрешения завершиться или отмены
+        self.started.append(name)
+        while not self.release.is_set() and not job.cancelled:
+            self.release.wait(0.01)
+        self.finished.release()
+
+    def wait_finished(self, count):
+        for _ in range(count):
+            self.assertTrue(self.finished.acquire(timeout=TIMEOUT))
+
+    def test_chats_are_served_round_robin(self):
+        manager = JobManager(workers=1)
+        positions = [manager.submit("alice", self.blocking, "alice-1")[1]]
+        self.wait_until(lambda: self.started)
+        positions += [
+            manager.submit("alice", self.blocking, "alice-2")[1],
+            manager.submit("alice", self.blocking, "alice-3")[1],
+            manager.submit("bob", self.blocking, "bob-1")[1],
+        ]
+
+        # Боб пришел позже, но его первая задача идет раньше второй задачи Алисы
+        self.assertEqual(positions, [0, 1, 2, 1])
+        self.assertEqual(manager.status("alice")[1], [2, 3])
+
+        self.release.set()
+        self.wait_finished(4)
+        self.assertEqual(self.started, ["alice-1", "bob-1", "alice-2", "alice-3"])
+
+    def test_one_running_job_per_chat(self):
+        manager = JobManager(workers=2)
+        manager.submit("alice", self.blocking, "alice-1")
+        second, position = manager.submit("alice", self.blocking, "alice-2")
+        manager.submit("bob", self.blocking, "bob-1")
+
+        # Свободный поток есть, но вторая задача ждет окончания первой
+        self.assertGreater(position, 0)
+        self.wait_until(lambda: len(self.started) == 2)
+        self.assertEqual(sorted(self.started), ["alice-1", "bob-1"])
+        self.assertEqual(second.state, QUEUED)
+
+        self.release.set()
+        self.wait_finished(3)
+        self.assertEqual(self.started[-1], "alice-2")
+
+    def test_one_running_job_per_account(self):
+        manager = JobManager(workers=2)
+        manager.submit("alice", self.blocking, "alice-1", account="shop@gmail.com")
+        self.wait_until(lambda: self.started)
+        second, position = manager.submit("bob", self.blocking, "bob-1", account="shop@gmail.com")
+        manager.submit("carol", self.blocking, "carol-1", account="carol@gmail.com")
+
+        # Боб ждет окончания задачи Алисы с тем же ящиком, Кэрол занимает свободный поток
+        self.assertGreater(position, 0)
+        self.wait_until(lambda: len(self.started) == 2)
+        self.assertEqual(self.started, ["alice-1", "carol-1"])
+        self.assertEqual(second.state, QUEUED)
+
+        self.release.set()
+        self.wait_finished(3)
+        self.assertEqual(self.started[-1], "bob-1")
+
+    def test_queue_limit_per_chat(self):
+        manager = JobManager(workers=1, max_queued_per_chat=1)
+        manager.submit("alice", self.blocking, "alice-1")
+        self.wait_until(lambda: self.started)
+        manager.submit("alice", self.blocking, "alice-2")
+
+        self.assertEqual(manager.submit("alice", self.blocking, "alice-3"), (None, None))
+        self.assertIsNotNone(manager.submit("bob", self.blocking, "bob-1")[0])
+
+    def test_cancel_running_and_pending(self):
+        manager = JobManager(workers=1)
+        running, _ = manager.submit("alice", self.blocking, "alice-1")
+        pending, _ = manager.submit("alice", self.blocking, "alice-2")
+        other, _ = manager.submit("bob", self.blocking, "bob-1")
+        self.wait_until(lambda: self.started)
+
+        self.assertEqual(manager.cancel("alice"), [running, pending])
+        self.assertEqual(pending.state, CANCELLED)
+        self.assertTrue(pending.cancelled)
+
+        self.wait_finished(1)
+        self.wait_until(lambda: running.state == CANCELLED)
+        self.assertFalse(other.cancelled)
+
+        self.release.set()
+        self.wait_finished(1)
+        self.assertEqual(self.started, ["alice-1", "bob-1"])
+        self.wait_until(lambda: other.state == DONE)
+
+    def test_failed_job_frees_the_worker(self):
+        def fail(job):
+            raise RuntimeError("boom")
+
+        manager = JobManager(workers=1)
+        self.release.set()
+        with self.assertLogs("parser.jobs", level="ERROR"):
+            failed, _ = manager.submit("alice", fail)
+            manager.submit("alice", self.blocking, "alice-2")
+            self.wait_finished(1)
+        self.assertEqual(failed.state, FAILED)
+
+    def wait_until(self, predicate):
+        done = threading.Event()
+        for _ in range(TIMEOUT * 100):
+            if predicate():
+                return
+            done.wait(0.01)
+        self.fail("условие не выполнилось")
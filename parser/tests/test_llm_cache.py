@@ -0,0 +1,57 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from parser.llm_cache import ExtractionCache
+from parser.management.commands import parser_emails as pe
+from parser.throttling import RateLimiter
+
+CONTACT = '{"name": "John Doe", "phone": "+1 234-567-8901", "website": "https://acme.example", "company": "Acme"}'
+
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.replies.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class ContactCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache = ExtractionCache(path=os.path.join(cache_dir.name, "llm_cache.sqlite3"))
+
+        self.completions = FakeCompletions(["not json {", CONTACT])
+        client = SimpleNamespace(chat=SimpleNamespace(completions=self.completions))
+        patcher = mock.patch.multiple(
+            pe, extraction_cache=cache, rate_limiter=RateLimiter(10 ** 6, 10 ** 9),
+            get_openai_client=lambda: client,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def extract(self):
+        return pe.extract_contact_info("Best regards, John Doe", "John", "john@acme.example")
+
+    def test_malformed_reply_is_not_cached(self):
+        self.assertEqual(self.extract(), pe.EXTRACTION_FALLBACKS)
+
+        contact = self.extract()
+        self.assertEqual(contact["name"], "John Doe")
+        self.assertEqual(contact["company"], "Acme")
+
+        # Правильный ответ уже в кэше
+        self.assertEqual(self.extract(), contact)
+        self.assertEqual(self.completions.calls, 2)
+
+    def test_json_that_is_not_an_object_is_rejected(self):
+        with self.assertRaises(ValueError):
+            pe.load_contact_json('["John Doe"]')
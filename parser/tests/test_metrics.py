@@ -0,0 +1,34 @@
+import urllib.error
+import urllib.request
+
+from django.test import SimpleTestCase
+
+from parser import metrics
+
+
+class MetricsServerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = metrics.serve("127.0.0.1", 0, token="secret")
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def get(self, path, token="secret"):
+        request = urllib.request.Request(self.url + path, headers={"Authorization": f"Bearer {token}"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as e:
+            return e.code, ""
+
+    def test_serves_only_metrics(self):
+        status, body = self.get("/metrics")
+        self.assertEqual(status, 200)
+        self.assertIn("# TYPE parser_stage_seconds histogram", body)
+
+        for path in ("/admin/", "/telegram/webhook/", "/"):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)[0], 404)
+
+    def test_requires_token(self):
+        self.assertEqual(self.get("/metrics", token="wrong")[0], 403)
@@ -0,0 +1,135 @@
+from email.mime.text import MIMEText
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from parser.bench.imap_server import UID_VALIDITY, FakeIMAPServer
+from parser.checkpoints import JOB_MAX_ATTEMPTS, find_active_job
+from parser.imap_pool import EXPUNGED, fetch_rfc822_batched, fetch_text_parts
+from parser.management.commands import parser_emails as pe
+from parser.models import AutoNews, MailboxSyncState, ParsingJob
+
+
+ACCOUNT = "resume@test.example"
+VANISHED_UID = 99999
+
+
+def newsletter(index):
+    msg = MIMEText(f"News #{index}", "plain", "utf-8")
+    msg["From"] = f"News {index} <news{index}@shop.example>"
+    msg["Subject"] = f"Newsletter #{index}"
+    msg["Date"] = "Mon, 01 Jan 2024 10:00:00 +0000"
+    msg["Message-ID"] = f"<news-{index}@shop.example>"
+    msg["List-Unsubscribe"] = "<https://shop.example/unsubscribe>"
+    return msg.as_bytes()
+
+
+class FakeIMAPTestCase(TransactionTestCase):
+    def setUp(self):
+        self.server = FakeIMAPServer({uid: newsletter(uid) for uid in (1, 2, 3)}).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        patcher = mock.patch.multiple(pe, IMAP_SERVER="127.0.0.1", IMAP_PORT=self.server.port, IMAP_SSL=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self):
+        return pe.connect_imap(ACCOUNT, "password")
+
+
+class ResumeTests(FakeIMAPTestCase):
+    def create_job(self, attempts=1):
+        last_emails = {f"news{uid}@shop.example": uid for uid in (1, 2, 3)}
+        last_emails["gone@shop.example"] = VANISHED_UID
+        return ParsingJob.objects.create(
+            account=ACCOUNT, mailbox=pe.IMAP_MAILBOX, uid_validity=UID_VALIDITY,
+            last_emails=last_emails, max_uid=VANISHED_UID, attempts=attempts,
+        )
+
+    def test_resume_with_vanished_uid_finishes_job(self):
+        job = self.create_job()
+
+        result = pe.get_emails(ACCOUNT, "password", output="db", connections=1)
+
+        self.assertIsNotNone(result)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ParsingJob.DONE)
+        self.assertEqual(job.processed, 4)
+        self.assertEqual((job.auto_mails, job.user_mails), (3, 0))
+        self.assertEqual(AutoNews.objects.count(), 3)
+        self.assertEqual(MailboxSyncState.objects.get(account=ACCOUNT).last_uid, VANISHED_UID)
+
+    def test_stage_failure_keeps_job_active(self):
+        save_result = pe.save_result
+
+        def flaky_save(result, *args, **kwargs):
+            if result["uid"] == b"2":
+                raise RuntimeError("database is locked")
+            return save_result(result, *args, **kwargs)
+
+        with mock.patch.object(pe, "save_result", flaky_save):
+            self.assertIsNone(pe.get_emails(ACCOUNT, "password", output="db", connections=1))
+
+        job = ParsingJob.objects.get(account=ACCOUNT)
+        self.assertEqual(job.status, ParsingJob.ACTIVE)
+        self.assertEqual(AutoNews.objects.count(), 2)
+        self.assertFalse(MailboxSyncState.objects.filter(account=ACCOUNT).exists())
+
+        # Следующий запуск повторяет только письмо, на котором упала стадия
+        self.assertIsNotNone(pe.get_emails(ACCOUNT, "password", output="db", connections=1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ParsingJob.DONE)
+        self.assertEqual(AutoNews.objects.count(), 3)
+        self.assertEqual(MailboxSyncState.objects.get(account=ACCOUNT).last_uid, 3)
+
+    def test_job_is_abandoned_after_max_attempts(self):
+        job = self.create_job(attempts=JOB_MAX_ATTEMPTS)
+
+        self.assertIsNone(find_active_job(ACCOUNT, pe.IMAP_MAILBOX, UID_VALIDITY))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ParsingJob.FAILED)
+
+    def test_resume_counts_attempts(self):
+        job = self.create_job()
+
+        self.assertEqual(find_active_job(ACCOUNT, pe.IMAP_MAILBOX, UID_VALIDITY).pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+
+
+class VanishedBodyTests(FakeIMAPTestCase):
+    def test_fetchers_report_expunged_messages(self):
+        for fetch in (fetch_rfc822_batched, fetch_text_parts):
+            with self.subTest(fetch=fetch.__name__):
+                mail = self.connect()
+                self.addCleanup(mail.logout)
+                fetched = dict(fetch(mail, [b"1", str(VANISHED_UID).encode()]))
+
+                self.assertIn(b"Newsletter #1", fetched[b"1"])
+                self.assertEqual(fetched[str(VANISHED_UID).encode()], EXPUNGED)
+
+
+class SearchNewUidsTests(FakeIMAPTestCase):
+    def search(self, sync_state, uid_validity=UID_VALIDITY):
+        mail = self.connect()
+        self.addCleanup(mail.logout)
+        return pe.search_new_uids(mail, sync_state, uid_validity)
+
+    def sync_state(self, last_uid, uid_validity=UID_VALIDITY):
+        return MailboxSyncState(account=ACCOUNT, mailbox=pe.IMAP_MAILBOX, uid_validity=uid_validity, last_uid=last_uid)
+
+    def test_first_run_returns_all(self):
+        self.assertEqual(self.search(None), [b"1", b"2", b"3"])
+
+    def test_returns_only_new_uids(self):
+        self.assertEqual(self.search(self.sync_state(1)), [b"2", b"3"])
+
+    def test_no_new_mail_skips_last_message(self):
+        # Сервер отвечает на 4:* последним письмом, хотя оно уже обработано
+        for last_uid in (3, 10):
+            with self.subTest(last_uid=last_uid):
+                self.assertEqual(self.search(self.sync_state(last_uid)), [])
+
+    def test_changed_uid_validity_returns_all(self):
+        self.assertEqual(self.search(self.sync_state(3, uid_validity=UID_VALIDITY + 1)), [b"1", b"2", b"3"])
@@ -0,0 +1,108 @@
+import re
+from email.parser import HeaderParser
+
+from django.test import SimpleTestCase
+
+from parser.management.commands import parser_emails as pe
+from parser.rules import DEFAULT_RULES, RuleEngine, build_trie_pattern
+
+
+class TriePatternTests(SimpleTestCase):
+    def test_matches_exactly_the_phrases(self):
+        phrases = ["do not reply", "do not respond", "click here", "click"]
+        pattern = re.compile(f"^(?:{build_trie_pattern(phrases)})$")
+
+        for phrase in phrases:
+            with self.subTest(phrase=phrase):
+                self.assertIsNotNone(pattern.match(phrase))
+        for text in ("do not", "click her", "do not replyx", ""):
+            with self.subTest(text=text):
+                self.assertIsNone(pattern.match(text))
+
+    def test_shares_common_prefixes(self):
+        self.assertEqual(build_trie_pattern(["abc", "abd"]), "ab(?:c|d)")
+
+
+class RuleEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = RuleEngine(DEFAULT_RULES)
+
+    def test_noreply_senders(self):
+        for sender in ("noreply@shop.example", "no-reply@shop.example", "NoReply@shop.example"):
+            with self.subTest(sender=sender):
+                self.assertEqual(self.engine.classify(sender, "Hello"), "noreply_sender")
+
+    def test_names_the_rule_that_matched(self):
+        cases = {
+            "To unsubscribe follow the link": "unsubscribe",
+            "Please DO NOT REPLY to this message": "automated_phrase",
+            "Sent via Google Calendar": "automated_phrase",
+            "<div>Hello</div>": "html_markup",
+            "Hi, are we still meeting tomorrow?": None,
+        }
+        for body, rule in cases.items():
+            with self.subTest(body=body):
+                self.assertEqual(self.engine.classify("anna@company.example", body), rule)
+
+    def test_first_rule_wins_for_shared_phrase(self):
+        engine = RuleEngine([
+            {"name": "first", "target": "body", "phrases": ["offer"]},
+            {"name": "second", "target": "body", "phrases": ["Offer", "sale"]},
+        ])
+        self.assertEqual(engine.classify("a@b.com", "Special OFFER"), "first")
+        self.assertEqual(engine.classify("a@b.com", "big sale"), "second")
+
+    def test_phrase_matched_by_case_folding(self):
+        # IGNORECASE считает "ſ" (длинная s) равной "s", а lower() ее не меняет
+        self.assertEqual(self.engine.classify("a@b.com", "To unſubscribe click"), "unsubscribe")
+        engine = RuleEngine([{"name": "sign", "target": "body", "phrases": ["kelvin"]}])
+        self.assertEqual(engine.classify("a@b.com", "Kelvin"), "sign")
+
+
+def headers(text):
+    return HeaderParser().parsestr(text)
+
+
+class HeaderRulesTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = RuleEngine(DEFAULT_RULES)
+
+    def test_names_the_header_rule_that_matched(self):
+        cases = {
+            "List-Unsubscribe: <https://shop.example/unsubscribe>\n": "list_unsubscribe",
+            "Precedence: bulk\n": "bulk_precedence",
+            "Auto-Submitted: auto-generated\n": "auto_submitted",
+            "X-Mailer: MailChimp Mailer\n": "bulk_mailer",
+            "Auto-Submitted: no\nPrecedence: first-class\n": None,
+        }
+        for text, rule in cases.items():
+            with self.subTest(headers=text):
+                self.assertEqual(self.engine.classify_headers(headers(text), "anna@company.example"), rule)
+
+    def test_checks_every_copy_of_a_header(self):
+        text = "Precedence: first-class\nPrecedence: list\n"
+        self.assertEqual(self.engine.classify_headers(headers(text), "anna@company.example"), "bulk_precedence")
+
+    def test_falls_back_to_sender(self):
+        self.assertEqual(self.engine.classify_headers(headers("Subject: Hi\n"), "no-reply@shop.example"), "noreply_sender")
+
+
+class ClassifyByHeadersTests(SimpleTestCase):
+    def test_automated_mail_is_saved_with_subject(self):
+        result = pe.classify_by_headers(headers(
+            "From: Shop <news@shop.example>\n"
+            "Subject: Big sale\n"
+            "Date: Mon, 01 Jan 2024 10:00:00 +0000\n"
+            "Message-ID: <sale-1@shop.example>\n"
+            "List-Unsubscribe: <https://shop.example/unsubscribe>\n"
+        ))
+
+        self.assertEqual(result["rule"], "list_unsubscribe")
+        self.assertTrue(result["auto_gen"])
+        self.assertEqual(result["content"], "Big sale")
+        self.assertEqual((result["sender_name"], result["sender_email"]), ("Shop", "news@shop.example"))
+        self.assertEqual(result["message_id"], "<sale-1@shop.example>")
+        self.assertEqual(result["sent_at"].year, 2024)
+
+    def test_plain_headers_need_the_body(self):
+        self.assertIsNone(pe.classify_by_headers(headers("From: Anna <anna@company.example>\nSubject: Lunch?\n")))
@@ -0,0 +1,66 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from parser.models import AutoNews, UserNews
+from parser.sinks import DatabaseSink, FormsSink, JobOutput
+
+
+class JobOutputTests(SimpleTestCase):
+    def test_flush_waits_only_for_own_submissions(self):
+        sink = FormsSink(workers=2)
+        release_slow = threading.Event()
+
+        def post(url, data):
+            if url == "slow":
+                release_slow.wait(5)
+
+        with mock.patch.object(sink, "_post", side_effect=post):
+            slow_job, fast_job = JobOutput(), JobOutput()
+            sink.submit("slow", {}, slow_job.pending)
+            sink.submit("fast", {}, fast_job.pending)
+
+            flushed = threading.Event()
+            threading.Thread(target=lambda: (fast_job.flush(), flushed.set()), daemon=True).start()
+            self.assertTrue(flushed.wait(2), "flush ждал чужую отправку")
+
+            release_slow.set()
+            slow_job.flush()
+            sink.close()
+
+
+def result(message_id, content="Hello", auto_gen=False, **fields):
+    return {
+        "auto_gen": auto_gen, "sender_name": "Anna", "sender_email": "anna@acme.example",
+        "content": content, "sent_at": None, "message_id": message_id, **fields,
+    }
+
+
+class DatabaseSinkTests(TestCase):
+    def save(self, *results):
+        sink = DatabaseSink()
+        for item in results:
+            sink.submit(item)
+        sink.flush()
+
+    def test_rerun_updates_saved_message(self):
+        self.save(result("<1@acme.example>", content="Old", tel=""))
+        self.save(result("<1@acme.example>", content="New", tel="+1 234-567-8901"))
+
+        row = UserNews.objects.get()
+        self.assertEqual((row.content, row.tel), ("New", "+1 234-567-8901"))
+
+    def test_same_message_id_in_one_batch_is_saved_once(self):
+        self.save(
+            result("<1@acme.example>", content="Old", auto_gen=True),
+            result("<1@acme.example>", content="New", auto_gen=True),
+        )
+
+        self.assertEqual(list(AutoNews.objects.values_list("content", flat=True)), ["New"])
+
+    def test_messages_without_message_id_are_inserted(self):
+        self.save(result(None), result(""))
+        self.save(result(None))
+
+        self.assertEqual(UserNews.objects.count(), 3)
@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase
+
+from parser.text_normalize import TRUNCATION_MARK, normalize_email_body
+
+
+class NormalizeEmailBodyTests(SimpleTestCase):
+    def normalize(self, body, **kwargs):
+        return normalize_email_body(body, **kwargs)[0]
+
+    def test_html_to_text(self):
+        body = (
+            "<html><head><style>p {color: red}</style></head><body>"
+            "<p>Hello&nbsp;Anna,</p><div>See you <b>tomorrow</b>.</div><script>track()</script></body></html>"
+        )
+        self.assertEqual(self.normalize(body), "Hello Anna,\n\nSee you tomorrow.")
+
+    def test_strips_quoted_reply(self):
+        body = (
+            "Sounds good, see you then.\n\nJohn\n\n"
+            "On Mon, 1 Jan 2024 at 10:00, Anna <anna@shop.example> wrote:\n> Can we meet tomorrow?\n"
+        )
+        self.assertEqual(self.normalize(body), "Sounds good, see you then.\n\nJohn")
+
+    def test_strips_russian_quote_header(self):
+        body = "Договорились.\n\nПн, 1 янв. 2024 г. в 10:00, Анна <anna@shop.example> пишет:\n> Встретимся завтра?"
+        self.assertEqual(self.normalize(body), "Договорились.")
+
+    def test_shortens_tracking_urls(self):
+        body = "Read more: https://click.shop.example/track?id=123&user=456&utm_source=mail"
+        self.assertEqual(self.normalize(body), "Read more: https://click.shop.example/track")
+
+    def test_truncation_keeps_signature(self):
+        body = "Lorem ipsum dolor sit amet. " * 200 + "\nBest regards,\nJohn Doe\nAcme Corp\n+1 234-567-8901"
+        text, tokens_before, tokens_after = normalize_email_body(body, max_tokens=100)
+
+        self.assertIn(TRUNCATION_MARK.strip(), text)
+        self.assertTrue(text.startswith("Lorem ipsum"))
+        self.assertTrue(text.endswith("Best regards,\nJohn Doe\nAcme Corp\n+1 234-567-8901"))
+        self.assertLess(tokens_after, tokens_before)
+        self.assertLessEqual(tokens_after, 100)
+
+    def test_short_plain_text_is_unchanged(self):
+        body = "Hi Anna,\n\nThanks for the offer.\n\nBest,\nJohn"
+        self.assertEqual(self.normalize(body), body)
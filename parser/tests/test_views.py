@@ -0,0 +1,39 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+SECRET = "webhook-secret"
+
+
+class TelegramWebhookTests(SimpleTestCase):
+    def post(self, body, secret=SECRET):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        return self.client.post(
+            reverse("telegram_webhook"), data=body, content_type="application/json", headers=headers,
+        )
+
+    @override_settings(TELEGRAM_WEBHOOK_SECRET="")
+    def test_refuses_updates_without_configured_secret(self):
+        with mock.patch("parser.views.bot.process_new_updates") as process:
+            response = self.post(json.dumps({"update_id": 1}), secret=None)
+        self.assertEqual(response.status_code, 403)
+        process.assert_not_called()
+
+    @override_settings(TELEGRAM_WEBHOOK_SECRET=SECRET)
+    def test_refuses_wrong_secret(self):
+        self.assertEqual(self.post(json.dumps({"update_id": 1}), secret="wrong").status_code, 403)
+
+    @override_settings(TELEGRAM_WEBHOOK_SECRET=SECRET)
+    def test_malformed_update_is_bad_request(self):
+        for body in ("{}", "not json", "[]"):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    @override_settings(TELEGRAM_WEBHOOK_SECRET=SECRET)
+    def test_passes_update_to_bot(self):
+        with mock.patch("parser.views.bot.process_new_updates") as process:
+            response = self.post(json.dumps({"update_id": 7}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(process.call_args.args[0][0].update_id, 7)
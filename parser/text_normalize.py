@@ -0,0 +1,132 @@
+"""Подготовка текста письма для ChatGPT: HTML в текст, без цитат и ссылок-трекеров, в пределах бюджета токенов"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from parser.throttling import estimate_tokens
+
+
+BODY_TOKEN_BUDGET = 1500  # Сколько токенов тела письма отдавать модели
+SIGNATURE_MAX_LINES = 12  # Сколько строк после прощания считать подписью
+URL_MAX_LENGTH = 80  # Более длинные ссылки сокращаются до адреса сайта
+TRUNCATION_MARK = "\n[...]\n"
+
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript", "template"}
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "div", "footer", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "ol", "p", "section", "table", "td", "th", "tr", "ul",
+}
+
+HTML_RE = re.compile(r"<(?:html|body|div|p|br|table|span|a)\b", re.IGNORECASE)
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+", re.IGNORECASE)
+
+# Строки, с которых начинается процитированная переписка
+QUOTE_HEADER_RE = re.compile(
+    r"^\s*(?:"
+    r"On .{0,200}wrote:\s*$"
+    r"|-{2,}\s*(?:Original Message|Forwarded message|Исходное сообщение|Пересылаемое сообщение)\s*-{2,}"
+    r"|From:\s.+\n\s*(?:Sent|Date):\s"
+    r"|От:\s.+\n\s*(?:Отправлено|Дата):\s"
+    r"|.{0,200}(?:пишет|написал|написала):\s*$"
+    r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+QUOTED_LINE_RE = re.compile(r"^\s*>.*$\n?", re.MULTILINE)
+SIGN_OFF_RE = re.compile(
+    r"^\s*(?:--\s*|(?:best|kind|warm)?\s*regards|thanks|thank you|cheers|sincerely|best wishes|best"
+    r"|с уважением|спасибо|всего доброго)[\s,.!]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Переводит HTML в текст: без разметки, стилей и скриптов, с переносами строк на месте блоков"""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return "".join(extractor.parts)
+
+
+def shorten_url(match):
+    url = match.group(0)
+    if len(url) <= URL_MAX_LENGTH and "?" not in url:
+        return url
+
+    # Ссылки рассылок и трекеров несут только параметры; для модели важен сайт
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path if len(parts.path) < 40 else ''}".rstrip("/")
+
+
+def strip_quoted(text):
+    """Убирает процитированную переписку: всё после "On ... wrote:" и строки, начинающиеся с >"""
+    match = QUOTE_HEADER_RE.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    return QUOTED_LINE_RE.sub("", text)
+
+
+def collapse_whitespace(text):
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def split_signature(text):
+    """Делит текст на основную часть и подпись, начинающуюся с последнего прощания"""
+    matches = list(SIGN_OFF_RE.finditer(text))
+    if not matches:
+        return text, ""
+
+    start = matches[-1].start()
+    signature_lines = text[start:].strip().splitlines()
+    if len(signature_lines) > SIGNATURE_MAX_LINES:
+        return text, ""  # После "прощания" слишком много текста — скорее всего, это не подпись
+    return text[:start].rstrip(), "\n".join(signature_lines)
+
+
+def truncate_to_budget(text, max_tokens=BODY_TOKEN_BUDGET):
+    """Обрезает текст до max_tokens, сохраняя начало письма и подпись"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    body, signature = split_signature(text)
+    # estimate_tokens считает len // 4 + 1, поэтому в max_tokens помещается (max_tokens - 1) * 4 символов
+    max_chars = (max_tokens - 1) * 4
+    budget_chars = max_chars - len(signature) - len(TRUNCATION_MARK)
+    if budget_chars <= 0:
+        return text[:max_chars]
+    return body[:budget_chars].rstrip() + TRUNCATION_MARK + signature
+
+
+def normalize_email_body(body, max_tokens=BODY_TOKEN_BUDGET):
+    """Готовит тело письма для ChatGPT; возвращает (текст, токенов до, токенов после)"""
+    tokens_before = estimate_tokens(body)
+
+    text = html_to_text(body) if HTML_RE.search(body) else body
+    text = URL_RE.sub(shorten_url, text)
+    text = collapse_whitespace(strip_quoted(text))
+    text = truncate_to_budget(text, max_tokens)
+
+    return text, tokens_before, estimate_tokens(text)
@@ -1,3 +1,53 @@
-from django.shortcuts import render
+import hmac
+import logging
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from telebot.types import Update
+
+from parser import metrics
+from parser.bot_instance import bot
+import parser.handlers  # noqa: F401 — регистрирует обработчики команд
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+@require_POST
+def telegram_webhook(request):
+    """Принимает обновление от Telegram и передает его обработчикам бота.
+
+    Без TELEGRAM_WEBHOOK_SECRET запросы не принимаются: иначе ботом мог бы управлять кто угодно.
+    Диалог /parse_emails хранит шаги в памяти процесса, поэтому webhook должен
+    обслуживать один процесс (один воркер ASGI/WSGI).
+    """
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not secret:
+        logger.warning("⚠ TELEGRAM_WEBHOOK_SECRET не задан, обновление отклонено")
+        return HttpResponseForbidden()
+    if not hmac.compare_digest(received.encode(), secret.encode()):
+        return HttpResponseForbidden()
+
+    try:
+        update = Update.de_json(request.body.decode("utf-8"))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return HttpResponseBadRequest()
+    if update is None:
+        return HttpResponseBadRequest()
+    # Обработчики запускаются в пуле потоков бота, поэтому Telegram сразу получает ответ
+    bot.process_new_updates([update])
+    return HttpResponse("ok")
+
+
+@require_GET
+def metrics_view(request):
+    """Отдает счетчики и гистограммы парсера в текстовом формате Prometheus"""
+    token = settings.METRICS_TOKEN
+    received = request.headers.get("Authorization", "")
+    if token and not hmac.compare_digest(received, f"Bearer {token}"):
+        return HttpResponseForbidden()
+
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)